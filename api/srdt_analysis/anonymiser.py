@@ -1,13 +1,12 @@
-import spacy
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
 
+from srdt_analysis.constants import ANONYMISER_BATCH_SIZE, ANONYMISER_BATCH_WINDOW
 from srdt_analysis.exceptions import SRDTException
 from srdt_analysis.logger import Logger
 
-nlp = spacy.load(
-    "fr_core_news_md",
-    disable=["tok2vec", "tagger", "parser", "attribute_ruler", "lemmatizer"],
-)
-
 entities_fr = {"ORG": "ENTREPRISE", "PER": "PERSONNE"}
 
 
@@ -17,23 +16,121 @@ restricted_token = ["CSE", "CSSCT", "RPX", "IJ", "CP"]
 logger = Logger("Anonymizer")
 
 
-def anonymise_spacy(question: str):
+@functools.cache
+def get_nlp():
+    # spaCy and its model take seconds to load, they are loaded on first use
+    # instead of on import
+    import spacy
+
+    return spacy.load(
+        "fr_core_news_md",
+        disable=["tok2vec", "tagger", "parser", "attribute_ruler", "lemmatizer"],
+    )
+
+
+def _anonymise_doc(question: str, doc) -> str:
+    # the question is rebuilt once from the spans kept and the replacements
+    parts = []
+    last = 0
+    for ent in doc.ents:
+        label_en = ent.label_
+        if label_en in entities_fr.keys() and ent.text not in restricted_token:
+            parts.append(question[last : ent.start_char])
+            parts.append(entities_fr[label_en])
+            last = ent.start_char + len(ent.text)
+    parts.append(question[last:])
+    return "".join(parts)
+
+
+def anonymise_batch(
+    questions: list[str],
+    batch_size: int = ANONYMISER_BATCH_SIZE,
+    n_process: int = 1,
+) -> list[str]:
+    """Anonymise questions in bulk through nlp.pipe, `n_process` > 1 starts
+    worker processes and is meant for offline use (question logs...).
+    """
     try:
-        doc = nlp(question)
-
-        anonymised = question
-
-        # replace entities
-        for ent in reversed(doc.ents):
-            start = ent.start_char
-            end = start + len(ent.text)
-            label_en = ent.label_
-            if label_en in entities_fr.keys() and ent.text not in restricted_token:
-                anonymised = (
-                    anonymised[:start] + entities_fr[label_en] + anonymised[end:]
-                )
-        return anonymised
+        docs = get_nlp().pipe(questions, batch_size=batch_size, n_process=n_process)
+        return [_anonymise_doc(question, doc) for question, doc in zip(questions, docs)]
     except ValueError as ve:
         message = f"Anonymize validation error: {str(ve)}"
         logger.error(message)
         raise SRDTException(message=message)
+
+
+def anonymise_spacy(question: str) -> str:
+    return anonymise_batch([question])[0]
+
+
+class AsyncAnonymiser:
+    """Anonymisation for the API, off the event loop. Questions arriving
+    within ANONYMISER_BATCH_WINDOW seconds are merged into one nlp.pipe call,
+    run on a single thread so that the shared pipeline is used by one batch
+    at a time.
+    """
+
+    def __init__(self):
+        self._executor = ThreadPoolExecutor(1, thread_name_prefix="anonymiser")
+        self._pending: list[tuple[str, asyncio.Future]] = []
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._batches: set[asyncio.Task] = set()
+
+    async def close(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush()
+        if self._batches:
+            await asyncio.gather(*self._batches, return_exceptions=True)
+        self._executor.shutdown()
+
+    async def load(self) -> None:
+        # on the anonymisation thread, the pipeline is never loaded twice
+        await asyncio.get_running_loop().run_in_executor(self._executor, get_nlp)
+
+    async def anonymise(self, question: str) -> str:
+        loop = asyncio.get_running_loop()
+        future: asyncio.Future[str] = loop.create_future()
+        self._pending.append((question, future))
+
+        if len(self._pending) >= ANONYMISER_BATCH_SIZE:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(ANONYMISER_BATCH_WINDOW, self._flush)
+
+        return await future
+
+    def _flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+
+        pending, self._pending = self._pending, []
+        if not pending:
+            return
+
+        task = asyncio.create_task(self._anonymise_batch(pending))
+        self._batches.add(task)
+        task.add_done_callback(self._batches.discard)
+
+    async def _anonymise_batch(self, pending: list[tuple[str, asyncio.Future]]):
+        questions = [question for question, _ in pending]
+        try:
+            anonymised = await asyncio.get_running_loop().run_in_executor(
+                self._executor, anonymise_batch, questions
+            )
+        except Exception as e:
+            if len(pending) > 1:
+                # the questions are anonymised one by one, so that only the
+                # ones that fail get the error
+                for item in pending:
+                    await self._anonymise_batch([item])
+                return
+            _, future = pending[0]
+            if not future.done():
+                future.set_exception(e)
+            return
+
+        for (_, future), result in zip(pending, anonymised):
+            if not future.done():
+                future.set_result(result)
@@ -1,20 +1,54 @@
+import argparse
 import os
 
 import uvicorn
 from dotenv import load_dotenv
 
-from srdt_analysis.constants import API_TIMEOUT
+from srdt_analysis.constants import (
+    API_GRACEFUL_SHUTDOWN_TIMEOUT,
+    API_TIMEOUT,
+    API_WORKERS,
+)
 
 load_dotenv()
 
 
 def start():
+    """Serve the API. In production (the default), uvicorn spawns `--workers`
+    processes (API_WORKERS), each loads its resources in the background. On
+    shutdown, in-flight requests, streamed answers included, get
+    API_GRACEFUL_SHUTDOWN_TIMEOUT seconds to complete.
+    `--dev` serves a single process that reloads on code changes.
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--dev", action="store_true")
+    parser.add_argument(
+        "--workers", type=int, default=int(os.getenv("API_WORKERS", API_WORKERS))
+    )
+    args = parser.parse_args()
+
+    host = os.getenv("API_HOST", "localhost")
+    port = int(os.getenv("API_PORT", 8000))
+
+    if args.dev:
+        uvicorn.run(
+            "srdt_analysis.api.main:app",
+            host=host,
+            port=port,
+            reload=True,
+            timeout_keep_alive=API_TIMEOUT,
+        )
+        return
+
+    # the event loop and http parser are uvloop and httptools when installed
+    # (uvicorn[standard]), asyncio and h11 otherwise
     uvicorn.run(
         "srdt_analysis.api.main:app",
-        host=os.getenv("API_HOST", "localhost"),
-        port=int(os.getenv("API_PORT", 8000)),
-        reload=True,
+        host=host,
+        port=port,
+        workers=args.workers,
         timeout_keep_alive=API_TIMEOUT,
+        timeout_graceful_shutdown=API_GRACEFUL_SHUTDOWN_TIMEOUT,
     )
 
 
@@ -1,18 +1,20 @@
+import asyncio
 import json
 import os
 import time
 import traceback
+from contextlib import asynccontextmanager
 from operator import itemgetter
-from typing import List
+from typing import Any, Awaitable, Callable, List
 
 from dotenv import load_dotenv
 from fastapi import Depends, FastAPI, HTTPException, Request, Security
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.security import APIKeyHeader
 from tenacity import RetryError
 
-from srdt_analysis.anonymiser import anonymise_spacy
+from srdt_analysis.anonymiser import AsyncAnonymiser
 from srdt_analysis.api.schemas import (
     AnonymizeRequest,
     AnonymizeResponse,
@@ -29,23 +31,129 @@ from srdt_analysis.api.schemas import (
     SearchRequest,
     SearchResponse,
 )
-from srdt_analysis.collections import AlbertCollectionHandler
-from srdt_analysis.constants import BASE_API_URL, CHUNK_INDEX
+from srdt_analysis.collections import AsyncAlbertCollectionHandler
+from srdt_analysis.constants import (
+    BASE_API_URL,
+    CHUNK_INDEX,
+    RERANK_CACHE_SIZE,
+    RERANK_CACHE_TTL,
+    SEARCH_CACHE_SIZE,
+    SEARCH_CACHE_TTL,
+    STARTUP_RETRY_INTERVAL,
+)
 from srdt_analysis.corpus import getChunksByIdcc, getDocsContent
-from srdt_analysis.elastic_handler import ElasticIndicesHandler
+from srdt_analysis.elastic_handler import (
+    AsyncElasticIndicesHandler,
+    reciprocal_rank_fusion,
+)
+from srdt_analysis.embedding_cache import normalize_text
+from srdt_analysis.embedding_store import content_hash
 from srdt_analysis.exceptions import SRDTException
+from srdt_analysis.index_lookups import ArticleUrls, CdtnUrls, IndexName
+from srdt_analysis.llm_client import LLMClientPool
 from srdt_analysis.llm_runner import LLMRunner
 from srdt_analysis.logger import Logger
+from srdt_analysis.metrics import MetricsMiddleware, render_metrics, timed
+from srdt_analysis.result_cache import ResultCache
 from srdt_analysis.tokenizer import Tokenizer
-from srdt_analysis.url_cleaner import clean_urls
+from srdt_analysis.url_cleaner import StreamingUrlCleaner, clean_urls
 
 load_dotenv()
 
-app = FastAPI()
-api_key_header = APIKeyHeader(name="Authorization", auto_error=True)
 logger = Logger("API")
 
 
+async def load_resource(
+    readiness: dict[str, bool], name: str, load: Callable[[], Awaitable[Any]]
+):
+    # retried until it succeeds, the API stays live but not ready meanwhile
+    start = time.time()
+    while True:
+        try:
+            if await load() is not False:
+                break
+            logger.warning(f"{name} not loaded, retrying")
+        except Exception as e:
+            logger.warning(f"{name} not loaded, retrying: {e}")
+        await asyncio.sleep(STARTUP_RETRY_INTERVAL)
+    readiness[name] = True
+    logger.info(f"{name} loaded in {time.time() - start:.2f}s")
+
+
+async def load_resources(app: FastAPI):
+    """Load the heavy resources in parallel, in the background of the
+    startup: requests are served meanwhile, loading what they need on first
+    use, and /healthz/ready reports when everything is loaded.
+    """
+    state = app.state
+
+    async def load_indexes():
+        await load_resource(state.readiness, "elasticsearch", state.es.check_connection)
+        await asyncio.gather(
+            load_resource(state.readiness, "article_urls", state.article_urls.load),
+            load_resource(state.readiness, "cdtn_urls", state.cdtn_urls.load),
+        )
+
+    await asyncio.gather(
+        load_indexes(),
+        load_resource(
+            state.readiness,
+            "tokenizer",
+            lambda: asyncio.to_thread(state.tokenizer.load),
+        ),
+        load_resource(state.readiness, "anonymiser", state.anonymiser.load),
+    )
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # a single Elasticsearch and Albert client (and connection pool) for the
+    # whole process, they connect on first use
+    albert = AsyncAlbertCollectionHandler()
+    es = AsyncElasticIndicesHandler(albert=albert)
+    app.state.albert = albert
+    app.state.es = es
+    # LLM clients are pooled per provider and key, across requests
+    app.state.llm_pool = LLMClientPool()
+    # a single tokenizer, its counts are cached across requests
+    app.state.tokenizer = Tokenizer()
+    # spaCy runs on its own thread, concurrent questions are batched
+    app.state.anonymiser = AsyncAnonymiser()
+    # article references are linked and links are checked without querying
+    # Elasticsearch
+    app.state.article_urls = ArticleUrls(es)
+    app.state.cdtn_urls = CdtnUrls(es)
+    # identical searches on the same ingestion are answered from memory
+    app.state.index_name = IndexName(es)
+    app.state.search_cache = ResultCache("search", SEARCH_CACHE_SIZE, SEARCH_CACHE_TTL)
+    # relevance scores of the (query, chunk) pairs already reranked
+    app.state.rerank_cache = ResultCache("rerank", RERANK_CACHE_SIZE, RERANK_CACHE_TTL)
+    app.state.readiness = dict.fromkeys(
+        [
+            "elasticsearch",
+            "article_urls",
+            "cdtn_urls",
+            "tokenizer",
+            "anonymiser",
+        ],
+        False,
+    )
+    loading = asyncio.create_task(load_resources(app))
+    try:
+        yield
+    finally:
+        loading.cancel()
+        await asyncio.gather(loading, return_exceptions=True)
+        await es.close()
+        await albert.close()
+        await app.state.llm_pool.close()
+        await app.state.anonymiser.close()
+
+
+app = FastAPI(lifespan=lifespan)
+api_key_header = APIKeyHeader(name="Authorization", auto_error=True)
+
+
 @app.exception_handler(Exception)
 async def srdt_exception_handler(request: Request, exc: Exception) -> JSONResponse:
     if isinstance(exc, SRDTException):
@@ -82,11 +190,49 @@ async def retry_error_handler(request: Request, exc: RetryError) -> JSONResponse
         )
 
 
-es_ok = ElasticIndicesHandler().check_connection()
-if es_ok:
-    logger.info("Elastic connection OK")
-else:
-    logger.error("Elastic connection KO")
+def get_es(request: Request) -> AsyncElasticIndicesHandler:
+    return request.app.state.es
+
+
+def get_albert(request: Request) -> AsyncAlbertCollectionHandler:
+    return request.app.state.albert
+
+
+def get_llm_pool(request: Request) -> LLMClientPool:
+    return request.app.state.llm_pool
+
+
+def get_anonymiser(request: Request) -> AsyncAnonymiser:
+    return request.app.state.anonymiser
+
+
+async def get_tokenizer(request: Request) -> Tokenizer:
+    tokenizer = request.app.state.tokenizer
+    if not tokenizer.loaded:
+        # requests arriving before the encoding is loaded in the background
+        # wait for it off the event loop
+        await asyncio.to_thread(tokenizer.load)
+    return tokenizer
+
+
+def get_article_urls(request: Request) -> ArticleUrls:
+    return request.app.state.article_urls
+
+
+def get_cdtn_urls(request: Request) -> CdtnUrls:
+    return request.app.state.cdtn_urls
+
+
+def get_index_name(request: Request) -> IndexName:
+    return request.app.state.index_name
+
+
+def get_search_cache(request: Request) -> ResultCache[List[ChunkResult]]:
+    return request.app.state.search_cache
+
+
+def get_rerank_cache(request: Request) -> ResultCache[float]:
+    return request.app.state.rerank_cache
 
 
 async def get_api_key(api_key: str = Security(api_key_header)):
@@ -108,6 +254,10 @@ app.add_middleware(
     allow_methods=["GET", "POST"],
     allow_headers=["Authorization", "Content-Type"],
 )
+# per-stage latency histograms, exposed on /metrics
+app.add_middleware(
+    MetricsMiddleware, server_timing=os.getenv("SERVER_TIMING_HEADER") == "true"
+)
 
 
 @app.get("/")
@@ -116,32 +266,60 @@ async def root(_api_key: str = Depends(get_api_key)):
     return {"status": "ok", "path": BASE_API_URL}
 
 
+# scraped with the API key as bearer token, like the other routes
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics(_api_key: str = Depends(get_api_key)):
+    return render_metrics()
+
+
 @app.get(f"{BASE_API_URL}/healthz")
 async def health():
     return {"health": "ok"}
 
 
+@app.get(f"{BASE_API_URL}/healthz/ready")
+async def ready(request: Request):
+    readiness = request.app.state.readiness
+    is_ready = all(readiness.values())
+    return JSONResponse(
+        status_code=200 if is_ready else 503,
+        content={"ready": is_ready, "resources": readiness},
+    )
+
+
 @app.post(f"{BASE_API_URL}/anonymize", response_model=AnonymizeResponse)
-async def anonymize(request: AnonymizeRequest):
+async def anonymize(
+    request: AnonymizeRequest,
+    tokenizer: Tokenizer = Depends(get_tokenizer),
+    anonymiser: AsyncAnonymiser = Depends(get_anonymiser),
+):
     start_time = time.time()
-    tokenizer = Tokenizer()
-    anonymized_question = anonymise_spacy(request.user_question)
+    with timed("anonymisation"):
+        anonymized_question = await anonymiser.anonymise(request.user_question)
+    nb_token_input, nb_token_output = tokenizer.compute_nb_tokens_many(
+        [request.user_question, anonymized_question]
+    )
     return AnonymizeResponse(
         time=time.time() - start_time,
         anonymized_question=anonymized_question,
-        nb_token_input=tokenizer.compute_nb_tokens(request.user_question),
-        nb_token_output=tokenizer.compute_nb_tokens(anonymized_question),
+        nb_token_input=nb_token_input,
+        nb_token_output=nb_token_output,
     )
 
 
 @app.post(f"{BASE_API_URL}/rephrase", response_model=RephraseResponse)
-async def rephrase(request: RephraseRequest, _api_key: str = Depends(get_api_key)):
+async def rephrase(
+    request: RephraseRequest,
+    _api_key: str = Depends(get_api_key),
+    llm_pool: LLMClientPool = Depends(get_llm_pool),
+    tokenizer: Tokenizer = Depends(get_tokenizer),
+):
     start_time = time.time()
-    tokenizer = Tokenizer()
     llm_runner = LLMRunner(
         llm_api_token=request.model.api_key,
         llm_model=request.model.name,
         llm_url=request.model.base_url,
+        llm_pool=llm_pool,
     )
 
     rephrased, queries = await llm_runner.rephrase_and_split(
@@ -149,20 +327,27 @@ async def rephrase(request: RephraseRequest, _api_key: str = Depends(get_api_key
         request.rephrasing_prompt,
         request.queries_splitting_prompt,
     )
+    nb_token_input, nb_token_output = tokenizer.compute_nb_tokens_many(
+        [request.question, rephrased]
+    )
 
     return RephraseResponse(
         time=time.time() - start_time,
         rephrased_question=rephrased,
         queries=queries,
-        nb_token_input=tokenizer.compute_nb_tokens(request.question),
-        nb_token_output=tokenizer.compute_nb_tokens(rephrased),
+        nb_token_input=nb_token_input,
+        nb_token_output=nb_token_output,
     )
 
 
 @app.get(f"{BASE_API_URL}/idcc/" + "{idcc}", response_model=SearchResponse)
-async def get_contributions_idcc(idcc: str, _api_key: str = Depends(get_api_key)):
+async def get_contributions_idcc(
+    idcc: str,
+    _api_key: str = Depends(get_api_key),
+    es: AsyncElasticIndicesHandler = Depends(get_es),
+):
     start_time = time.time()
-    idcc_chunks = getChunksByIdcc(idcc)
+    idcc_chunks = await getChunksByIdcc(es, idcc)
     return SearchResponse(
         time=time.time() - start_time,
         top_chunks=idcc_chunks,
@@ -170,63 +355,121 @@ async def get_contributions_idcc(idcc: str, _api_key: str = Depends(get_api_key)
 
 
 @app.post(f"{BASE_API_URL}/docs/retrieve", response_model=RetrieveResponse)
-async def get_docs(request: RetrieveRequest, _api_key: str = Depends(get_api_key)):
+async def get_docs(
+    request: RetrieveRequest,
+    _api_key: str = Depends(get_api_key),
+    es: AsyncElasticIndicesHandler = Depends(get_es),
+):
     start_time = time.time()
     ids = request.ids
-    contents = getDocsContent(ids)
+    contents = await getDocsContent(es, ids)
     return RetrieveResponse(time=time.time() - start_time, contents=contents)
 
 
 @app.post(f"{BASE_API_URL}/rerank", response_model=RerankResponse)
-async def rerank(request: RerankRequest, _api_key: str = Depends(get_api_key)):
+async def rerank(
+    request: RerankRequest,
+    _api_key: str = Depends(get_api_key),
+    albert: AsyncAlbertCollectionHandler = Depends(get_albert),
+    rerank_cache: ResultCache[float] = Depends(get_rerank_cache),
+):
     start_time = time.time()
-    collections = AlbertCollectionHandler()
 
     # Albert seemd to be using bge-reranker-v2-m3 that is limited to 512, Albert silently fails if we don't respect this limit / not documented
     # inputs = [tokenizer.take_n(input.content, 512) for input in request.inputs]
-    # TODO dunno why but hard limit seemd to perform better than token selection, we should build chunks based on this limitation if it actually exists
+    # TODO dunno why but hard limit seemd to perform better than token selection
+    # chunks fit this limit when ingested with CHUNK_LENGTH_UNIT=tokens
     inputs = [input.content[:8192] for input in request.inputs]
-    res = collections.rerank(request.prompt, inputs)
-
-    # reorder results based on rerank indices to map chunks and results
-    sorted_res = sorted(res, key=lambda res: res["index"])
-    zipped = list(
-        zip(
-            [rr["index"] for rr in sorted_res],
-            [rr["relevance_score"] for rr in sorted_res],
-            request.inputs,
-        )
-    )
 
-    # reorder using rerank score
+    # scores are cached per (query, chunk content) pair, only the pairs never
+    # scored are sent to Albert, and each duplicated chunk once
+    query = content_hash(normalize_text(request.prompt))
+    keys = [(query, content_hash(input)) for input in inputs]
+    scores: dict[tuple[str, str], float] = {}
+    missing: dict[tuple[str, str], str] = {}
+    for key, input in dict(zip(keys, inputs)).items():
+        score = rerank_cache.get(key)
+        if score is None:
+            missing[key] = input
+        else:
+            scores[key] = score
+
+    if missing:
+        with timed("rerank"):
+            res = await albert.rerank(request.prompt, list(missing.values()))
+        missing_keys = list(missing)
+        for rr in res:
+            key = missing_keys[rr["index"]]
+            scores[key] = rr["relevance_score"]
+            rerank_cache.set(key, rr["relevance_score"])
+
+    # reorder using rerank score, in the order of the inputs on ties
+    zipped = [
+        (scores[key], chunk)
+        for key, chunk in zip(keys, request.inputs)
+        if key in scores
+    ]
     reordered = [
-        RerankedChunk(chunk=r[2], rerank_score=r[1])
-        for r in sorted(zipped, key=itemgetter(1), reverse=True)
+        RerankedChunk(chunk=chunk, rerank_score=score)
+        for score, chunk in sorted(zipped, key=itemgetter(0), reverse=True)
     ]
 
     return RerankResponse(time=time.time() - start_time, results=reordered)
 
 
 @app.post(f"{BASE_API_URL}/search", response_model=SearchResponse)
-async def search(request: SearchRequest, _api_key: str = Depends(get_api_key)):
+async def search(
+    request: SearchRequest,
+    _api_key: str = Depends(get_api_key),
+    es: AsyncElasticIndicesHandler = Depends(get_es),
+    index_name: IndexName = Depends(get_index_name),
+    search_cache: ResultCache[List[ChunkResult]] = Depends(get_search_cache),
+):
     start_time = time.time()
-    es = ElasticIndicesHandler()
 
-    transformed_results: List[ChunkResult] = []
-
-    for prompt in request.prompts:
-        search_result = es.search(
+    async def search_prompt(prompt: str) -> List[ChunkResult]:
+        search_result = await es.search(
             index_name=CHUNK_INDEX,
             prompt=prompt,
             k=request.options.top_K,
             hybrid=request.options.hybrid or False,
             sources=request.options.collections,
+            idcc=request.idcc,
+            num_candidates=request.options.num_candidates,
         )
-
-        transformed_results = [
+        return [
             item for item in search_result if item.score >= request.options.threshold
         ]
 
+    async def search_prompts() -> List[ChunkResult]:
+        # run every prompt concurrently, then merge their ranked lists
+        results = await asyncio.gather(
+            *[search_prompt(prompt) for prompt in request.prompts]
+        )
+
+        if len(results) == 1:
+            return results[0]
+        with timed("rrf_fusion"):
+            return reciprocal_rank_fusion(list(results), request.options.top_K)
+
+    # the physical index is part of the key, so that the results of an
+    # ingestion are not served anymore once the alias is swapped
+    current_index = await index_name.data()
+    if current_index is None:
+        transformed_results = await search_prompts()
+    else:
+        key = (
+            current_index,
+            tuple(normalize_text(prompt) for prompt in request.prompts),
+            request.options.top_K,
+            request.options.threshold,
+            tuple(sorted(request.options.collections)),
+            bool(request.options.hybrid),
+            request.idcc,
+            request.options.num_candidates,
+        )
+        transformed_results = await search_cache.get_or_compute(key, search_prompts)
+
     return SearchResponse(
         time=time.time() - start_time,
         top_chunks=transformed_results,
@@ -234,13 +477,20 @@ async def search(request: SearchRequest, _api_key: str = Depends(get_api_key)):
 
 
 @app.post(f"{BASE_API_URL}/generate", response_model=GenerateResponse)
-async def generate(request: GenerateRequest, _api_key: str = Depends(get_api_key)):
+async def generate(
+    request: GenerateRequest,
+    _api_key: str = Depends(get_api_key),
+    llm_pool: LLMClientPool = Depends(get_llm_pool),
+    article_urls: ArticleUrls = Depends(get_article_urls),
+    cdtn_urls: CdtnUrls = Depends(get_cdtn_urls),
+    tokenizer: Tokenizer = Depends(get_tokenizer),
+):
     start_time = time.time()
-    tokenizer = Tokenizer()
     llm_runner = LLMRunner(
         llm_api_token=request.model.api_key,
         llm_model=request.model.name,
         llm_url=request.model.base_url,
+        llm_pool=llm_pool,
     )
 
     response = await llm_runner.chat_with_full_document(
@@ -248,39 +498,49 @@ async def generate(request: GenerateRequest, _api_key: str = Depends(get_api_key
         request.system_prompt,
     )
 
-    response = clean_urls(response)
+    with timed("clean_urls"):
+        response = await clean_urls(article_urls, cdtn_urls, response)
 
-    chat_history_str = " ".join(
-        [msg.get("content", "") for msg in request.chat_history]
+    # counted per message, the previous messages are cached from the last turns
+    *nb_tokens_history, nb_token_output = await tokenizer.compute_nb_tokens_many_async(
+        [msg.get("content", "") for msg in request.chat_history] + [response]
     )
 
     return GenerateResponse(
         time=time.time() - start_time,
         text=response,
-        nb_token_input=tokenizer.compute_nb_tokens(chat_history_str),
-        nb_token_output=tokenizer.compute_nb_tokens(response),
+        nb_token_input=sum(nb_tokens_history),
+        nb_token_output=nb_token_output,
     )
 
 
 @app.post(f"{BASE_API_URL}/generate/stream")
 async def generate_stream(
-    request: GenerateRequest, _api_key: str = Depends(get_api_key)
+    request: GenerateRequest,
+    _api_key: str = Depends(get_api_key),
+    llm_pool: LLMClientPool = Depends(get_llm_pool),
+    article_urls: ArticleUrls = Depends(get_article_urls),
+    cdtn_urls: CdtnUrls = Depends(get_cdtn_urls),
+    tokenizer: Tokenizer = Depends(get_tokenizer),
 ):
     start_time = time.time()
-    tokenizer = Tokenizer()
     llm_runner = LLMRunner(
         llm_api_token=request.model.api_key,
         llm_model=request.model.name,
         llm_url=request.model.base_url,
+        llm_pool=llm_pool,
     )
 
-    chat_history_str = " ".join(
-        [msg.get("content", "") for msg in request.chat_history]
+    # counted per message, the previous messages are cached from the last turns
+    nb_token_input = sum(
+        await tokenizer.compute_nb_tokens_many_async(
+            [msg.get("content", "") for msg in request.chat_history]
+        )
     )
-    nb_token_input = tokenizer.compute_nb_tokens(chat_history_str)
 
     async def generate_chunks():
-        accumulated_response = ""
+        # links and references are cleaned as the answer is streamed
+        cleaner = StreamingUrlCleaner(article_urls, cdtn_urls)
         try:
             # Send initial metadata
             initial_data = {
@@ -295,21 +555,32 @@ async def generate_stream(
                 request.chat_history,
                 request.system_prompt,
             ):
-                accumulated_response += chunk
+                cleaned = await cleaner.feed(chunk)
+                if cleaned:
+                    chunk_data = {
+                        "type": "chunk",
+                        "content": cleaned,
+                    }
+                    yield f"data: {json.dumps(chunk_data)}\n\n"
+
+            cleaned = await cleaner.flush()
+            if cleaned:
                 chunk_data = {
                     "type": "chunk",
-                    "content": chunk,
+                    "content": cleaned,
                 }
                 yield f"data: {json.dumps(chunk_data)}\n\n"
 
-            cleaned_accumulated = clean_urls(accumulated_response)
             # Send final metadata
+            (nb_token_output,) = await tokenizer.compute_nb_tokens_many_async(
+                [cleaner.text]
+            )
             final_data = {
                 "type": "end",
                 "time": time.time() - start_time,
-                "text": cleaned_accumulated,
+                "text": cleaner.text,
                 "nb_token_input": nb_token_input,
-                "nb_token_output": tokenizer.compute_nb_tokens(cleaned_accumulated),
+                "nb_token_output": nb_token_output,
             }
             yield f"data: {json.dumps(final_data)}\n\n"
 
@@ -47,6 +47,7 @@ class SearchOptions(BaseModel):
     threshold: float = Field(default=0, ge=0.0, le=2.0)
     collections: List[str] = Field(default=SOURCES)
     hybrid: Optional[bool] = False
+    num_candidates: Optional[int] = Field(default=None, ge=1, le=10000)
 
     @field_validator("collections")
     @classmethod
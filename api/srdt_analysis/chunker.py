@@ -1,6 +1,7 @@
+import os
 import re
 import unicodedata
-from typing import Callable, Dict
+from typing import Any, Callable, Dict, Optional, get_args
 
 from bs4 import BeautifulSoup
 from langchain_text_splitters import (
@@ -9,12 +10,31 @@ from langchain_text_splitters import (
     RecursiveCharacterTextSplitter,
 )
 
-from srdt_analysis.constants import CHUNK_OVERLAP, CHUNK_SIZE
+from srdt_analysis.constants import (
+    CHUNK_LENGTH_UNIT,
+    CHUNK_OVERLAP,
+    CHUNK_SIZE,
+    CHUNK_TOKEN_SIZES,
+)
 from srdt_analysis.models import ChunkerContentType, SplitDocument
 
+separators = ["\n\n", "\n", ". ", " "]
+
 
 class Chunker:
-    def __init__(self):
+    """Split documents on their headers, then into chunks of at most
+    CHUNK_SIZE characters, or of CHUNK_TOKEN_SIZES tokens of the content type
+    when the length unit is "tokens".
+    """
+
+    def __init__(self, length_unit: Optional[str] = None):
+        if length_unit is None:
+            length_unit = os.getenv("CHUNK_LENGTH_UNIT", CHUNK_LENGTH_UNIT)
+        if length_unit not in ("characters", "tokens"):
+            raise ValueError(
+                f"Unknown CHUNK_LENGTH_UNIT {length_unit}, expected characters or tokens"
+            )
+        self.length_unit = length_unit
         self._markdown_splitter = MarkdownHeaderTextSplitter(
             [
                 ("#", "Header 1"),
@@ -36,12 +56,52 @@ class Chunker:
                 ("h6", "Header 6"),
             ]
         )
-        self._character_recursive_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=CHUNK_SIZE,
-            chunk_overlap=CHUNK_OVERLAP,
-            separators=["\n\n", "\n", ". ", " "],
+        self._text_splitters = {
+            content_type: self._text_splitter(content_type)
+            for content_type in get_args(ChunkerContentType)
+        }
+
+    def _text_splitter(
+        self, content_type: ChunkerContentType
+    ) -> RecursiveCharacterTextSplitter:
+        if self.length_unit == "characters":
+            return RecursiveCharacterTextSplitter(
+                chunk_size=CHUNK_SIZE,
+                chunk_overlap=CHUNK_OVERLAP,
+                separators=separators,
+            )
+
+        model = os.getenv("TIKTOKEN_TOKENIZER_MODEL")
+        if model is None:
+            raise ValueError("TIKTOKEN_TOKENIZER_MODEL environment variable is not set")
+        chunk_size, chunk_overlap = CHUNK_TOKEN_SIZES[content_type]
+        return RecursiveCharacterTextSplitter.from_tiktoken_encoder(
+            encoding_name=model,
+            # documents are plain text, special tokens are not parsed
+            disallowed_special=(),
+            chunk_size=chunk_size,
+            chunk_overlap=chunk_overlap,
+            separators=separators,
         )
 
+    def settings(self, content_type: ChunkerContentType) -> dict[str, Any]:
+        """Parameters of the chunks of `content_type`, a document chunked
+        with other settings is chunked again.
+        """
+        if self.length_unit == "characters":
+            return {
+                "length_unit": self.length_unit,
+                "chunk_size": CHUNK_SIZE,
+                "chunk_overlap": CHUNK_OVERLAP,
+            }
+        chunk_size, chunk_overlap = CHUNK_TOKEN_SIZES[content_type]
+        return {
+            "length_unit": self.length_unit,
+            "encoding": os.getenv("TIKTOKEN_TOKENIZER_MODEL"),
+            "chunk_size": chunk_size,
+            "chunk_overlap": chunk_overlap,
+        }
+
     def normalize(self, text):
         normalized = unicodedata.normalize("NFKD", text)
         # remove unecessary blanks
@@ -49,7 +109,7 @@ class Chunker:
 
     def split_markdown(self, markdown: str) -> list[SplitDocument]:
         md_header_splits = self._markdown_splitter.split_text(markdown)
-        documents = self._character_recursive_splitter.split_documents(md_header_splits)
+        documents = self._text_splitters["markdown"].split_documents(md_header_splits)
         return [
             SplitDocument(self.normalize(doc.page_content), doc.metadata)
             for doc in documents
@@ -57,23 +117,26 @@ class Chunker:
 
     def split_html(self, html: str) -> list[SplitDocument]:
         html_header_splits = self._html_splitter.split_text(html)
-        documents = self._character_recursive_splitter.split_documents(
-            html_header_splits
-        )
+        documents = self._text_splitters["html"].split_documents(html_header_splits)
         return [
             SplitDocument(self.normalize(doc.page_content), doc.metadata)
             for doc in documents
         ]
 
-    def split_character_recursive(self, content: str) -> list[SplitDocument]:
-        text_splits = self._character_recursive_splitter.split_text(content)
+    def _split_text(
+        self, content: str, content_type: ChunkerContentType
+    ) -> list[SplitDocument]:
+        text_splits = self._text_splitters[content_type].split_text(content)
         return [SplitDocument(self.normalize(text), {}) for text in text_splits]
 
+    def split_character_recursive(self, content: str) -> list[SplitDocument]:
+        return self._split_text(content, "character_recursive")
+
     def split_html_contribs(self, content: str) -> list[SplitDocument]:
         # specific case for contributions, we parse html first then run standard text split
         soup = BeautifulSoup(content, "html.parser")
         text = soup.get_text(separator=" ")
-        return self.split_character_recursive(text)
+        return self._split_text(text, "html_contribs")
 
     def split(
         self,
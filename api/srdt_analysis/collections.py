@@ -1,9 +1,16 @@
+import asyncio
+import importlib.util
 import json
 import os
+from typing import Optional
 
 import httpx
 
 from srdt_analysis.constants import (
+    ALBERT_EMBEDDING_BATCH_SIZE,
+    ALBERT_EMBEDDING_BATCH_WINDOW,
+    ALBERT_MAX_CONCURRENCY,
+    ALBERT_MAX_CONNECTIONS,
     ALBERT_RERANK_MODEL,
     ALBERT_SEARCH_TIMEOUT,
 )
@@ -11,6 +18,7 @@ from srdt_analysis.exceptions import (
     ConfigurationError,
     ExternalServiceError,
 )
+from srdt_analysis.logger import Logger
 from srdt_analysis.models import (
     COLLECTION_ID,
     COLLECTIONS_ID,
@@ -23,28 +31,35 @@ from srdt_analysis.models import (
 )
 
 
-class AlbertCollectionHandler:
+class BaseAlbertCollectionHandler:
+    """Configuration shared by the sync (ingestion) and async (API) handlers."""
+
     def __init__(self):
-        self.api_key = os.getenv("ALBERT_API_KEY")
-        if not self.api_key:
+        api_key = os.getenv("ALBERT_API_KEY")
+        if not api_key:
             raise ConfigurationError(
                 "ALBERT_API_KEY environment variable is not set", service="Albert"
             )
-        self.base_url = os.getenv("ALBERT_ENDPOINT")
-        if not self.base_url:
+        self.api_key: str = api_key
+        base_url = os.getenv("ALBERT_ENDPOINT")
+        if not base_url:
             raise ConfigurationError(
                 "ALBERT_ENDPOINT environment variable is not set", service="Albert"
             )
-        self.model = os.getenv("ALBERT_VECTORISATION_MODEL")
-        if not self.model:
+        self.base_url: str = base_url
+        model = os.getenv("ALBERT_VECTORISATION_MODEL")
+        if not model:
             raise ConfigurationError(
                 "ALBERT_VECTORISATION_MODEL environment variable is not set",
                 service="Albert",
             )
+        self.model: str = model
         self.headers = {
             "Authorization": f"Bearer {self.api_key}",
         }
 
+
+class AlbertCollectionHandler(BaseAlbertCollectionHandler):
     def _create(self, collection_name: CollectionName) -> COLLECTION_ID:
         payload = {"name": collection_name, "model": self.model}
         response = httpx.post(
@@ -89,7 +104,7 @@ class AlbertCollectionHandler:
 
     def embeddings(
         self, chunks: list[str], timeout: int = ALBERT_SEARCH_TIMEOUT, retry=False
-    ) -> list[float]:
+    ) -> list[list[float]]:
         try:
             response = httpx.post(
                 f"{self.base_url}/v1/embeddings",
@@ -220,3 +235,200 @@ class AlbertCollectionHandler:
                 response.raise_for_status()
 
         return
+
+
+class AsyncAlbertCollectionHandler(BaseAlbertCollectionHandler):
+    """Async handler used by the API, it keeps a single pooled
+    httpx.AsyncClient for the whole process and bounds the number of
+    concurrent upstream calls.
+
+    Concurrent `embeddings` calls arriving within
+    ALBERT_EMBEDDING_BATCH_WINDOW seconds are merged into one upstream call,
+    the results are then split back to each caller.
+    """
+
+    def __init__(self, client: Optional[httpx.AsyncClient] = None):
+        super().__init__()
+        self.logger = Logger("Albert")
+        self.client = client if client is not None else self.create_client()
+        self.rate_limit = asyncio.Semaphore(ALBERT_MAX_CONCURRENCY)
+        self._pending: list[tuple[list[str], asyncio.Future]] = []
+        self._pending_size = 0
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._batches: set[asyncio.Task] = set()
+
+    def create_client(self) -> httpx.AsyncClient:
+        return httpx.AsyncClient(
+            base_url=self.base_url,
+            headers=self.headers,
+            timeout=ALBERT_SEARCH_TIMEOUT,
+            limits=httpx.Limits(
+                max_connections=ALBERT_MAX_CONNECTIONS,
+                max_keepalive_connections=ALBERT_MAX_CONNECTIONS,
+            ),
+            # HTTP/2 needs the optional h2 package, keep-alive HTTP/1.1 otherwise
+            http2=importlib.util.find_spec("h2") is not None,
+        )
+
+    async def close(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush()
+        if self._batches:
+            await asyncio.gather(*self._batches, return_exceptions=True)
+        await self.client.aclose()
+
+    async def list_collections(self) -> AlbertCollectionsList:
+        try:
+            async with self.rate_limit:
+                response = await self.client.get(
+                    "/v1/collections", params={"limit": 100}
+                )
+            response.raise_for_status()
+            response_data = response.json()
+            return response_data.get("data", [])
+        except (httpx.HTTPError, json.JSONDecodeError, KeyError) as e:
+            raise ExternalServiceError(
+                f"Albert service error listing collections: {str(e)}", service="Albert"
+            ) from e
+
+    async def embeddings(self, chunks: list[str]) -> list[list[float]]:
+        if not chunks:
+            return []
+
+        loop = asyncio.get_running_loop()
+        future: asyncio.Future[list[list[float]]] = loop.create_future()
+        self._pending.append((chunks, future))
+        self._pending_size += len(chunks)
+
+        if self._pending_size >= ALBERT_EMBEDDING_BATCH_SIZE:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(
+                ALBERT_EMBEDDING_BATCH_WINDOW, self._flush
+            )
+
+        return await future
+
+    def _flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+
+        pending, self._pending = self._pending, []
+        self._pending_size = 0
+        if not pending:
+            return
+
+        task = asyncio.create_task(self._embed_batch(pending))
+        self._batches.add(task)
+        task.add_done_callback(self._batches.discard)
+
+    async def _embed_batch(self, pending: list[tuple[list[str], asyncio.Future]]):
+        inputs = [text for chunks, _ in pending for text in chunks]
+        try:
+            embeddings = await self._embeddings(inputs)
+            if len(embeddings) != len(inputs):
+                raise ExternalServiceError(
+                    f"Albert embedding service error: expected {len(inputs)} "
+                    f"embeddings, received {len(embeddings)}",
+                    service="Albert",
+                )
+        except Exception as e:
+            for _, future in pending:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        offset = 0
+        for chunks, future in pending:
+            if not future.done():
+                future.set_result(embeddings[offset : offset + len(chunks)])
+            offset += len(chunks)
+
+    async def _embeddings(
+        self, chunks: list[str], retry: bool = False
+    ) -> list[list[float]]:
+        try:
+            async with self.rate_limit:
+                response = await self.client.post(
+                    "/v1/embeddings", json={"model": self.model, "input": chunks}
+                )
+            if response.status_code == 200:
+                result = response.json()
+                return [q["embedding"] for q in result["data"]]
+            elif not retry:
+                return await self._embeddings(chunks=chunks, retry=True)
+            else:
+                response.raise_for_status()
+                return []
+        except (httpx.HTTPError, json.JSONDecodeError, KeyError) as e:
+            raise ExternalServiceError(
+                f"Albert embedding service error: {str(e)}", service="Albert"
+            ) from e
+
+    async def search(
+        self,
+        prompt: str,
+        id_collections: COLLECTIONS_ID,
+        k: int = 5,
+        score_threshold: float = 0,
+    ) -> list[RankedChunk]:
+        try:
+            async with self.rate_limit:
+                response = await self.client.post(
+                    "/v1/search",
+                    json={
+                        "prompt": prompt,
+                        "collections": id_collections,
+                        "k": k,
+                        "score_threshold": score_threshold,
+                    },
+                )
+            response.raise_for_status()
+            result = response.json()
+            return result.get("data", [])
+        except httpx.HTTPStatusError as e:
+            raise ExternalServiceError(
+                f"Albert search error (HTTP {e.response.status_code})", service="Albert"
+            ) from e
+        except (httpx.RequestError, json.JSONDecodeError) as e:
+            raise ExternalServiceError(
+                f"Albert search error: {str(e)}", service="Albert"
+            ) from e
+
+    async def rerank(
+        self,
+        prompt: str,
+        input: list[str],
+    ) -> list[RerankedChunk]:
+        try:
+            async with self.rate_limit:
+                response = await self.client.post(
+                    "/v1/rerank",
+                    json={
+                        "query": prompt,
+                        "documents": input,
+                        "model": ALBERT_RERANK_MODEL,
+                    },
+                )
+            response.raise_for_status()
+            result = response.json()
+
+            chunks = result.get("results", [])
+
+            if len(chunks) == 0 and len(input) > 0:
+                raise ExternalServiceError(
+                    "Albert rerank error : no chunked received",
+                    service="Albert",
+                )
+            else:
+                return chunks
+        except httpx.HTTPStatusError as e:
+            raise ExternalServiceError(
+                f"Albert rerank error (HTTP {e.response.status_code})", service="Albert"
+            ) from e
+        except (httpx.RequestError, json.JSONDecodeError) as e:
+            raise ExternalServiceError(
+                f"Albert rerank error: {str(e)}", service="Albert"
+            ) from e
@@ -1,12 +1,100 @@
 CHUNK_SIZE = 4096
 CHUNK_OVERLAP = 0
+# unit of the chunks length: "characters" (CHUNK_SIZE, CHUNK_OVERLAP) or
+# "tokens" (CHUNK_TOKEN_SIZES)
+CHUNK_LENGTH_UNIT = "characters"
+# target size and overlap in tokens of the chunks of each content type. The
+# reranker truncates its inputs at 512 tokens of its own tokenizer, which cuts
+# french text into more tokens than tiktoken: room is left for the query
+CHUNK_TOKEN_SIZES: dict[str, tuple[int, int]] = {
+    "markdown": (384, 32),
+    "html": (384, 32),
+    "character_recursive": (384, 32),
+    "html_contribs": (384, 32),
+}
 COLLECTIONS_UPLOAD_BATCH_SIZE = 50
 BASE_URL_CDTN = "https://code.travail.gouv.fr"
 BASE_API_URL = "/api/v1"
 API_TIMEOUT = 180
+# worker processes of the API in production, and seconds given to in-flight
+# requests (streamed answers...) to complete on shutdown. Metrics, caches,
+# readiness and loaded models are per process, a pod runs a single worker
+# and the API is scaled with replicas
+API_WORKERS = 1
+API_GRACEFUL_SHUTDOWN_TIMEOUT = API_TIMEOUT
 ALBERT_SEARCH_TIMEOUT = 180
 ALBERT_RERANK_MODEL = "openweight-rerank"
+# pool and concurrency bounds of the API's Albert client
+ALBERT_MAX_CONNECTIONS = 20
+ALBERT_MAX_CONCURRENCY = 10
+# embeddings requests merged together within this window (seconds) or size
+ALBERT_EMBEDDING_BATCH_WINDOW = 0.005
+ALBERT_EMBEDDING_BATCH_SIZE = 64
 CHUNK_INDEX = "chunks-test"
+# idcc of the contributions that apply to every convention collective
+GENERIC_IDCC = "0000"
+ELASTIC_REQUEST_TIMEOUT = 30
+# pool and concurrency bounds of each LLM provider, idle timeout in seconds
+LLM_MAX_CONNECTIONS = 20
+LLM_MAX_CONCURRENCY = 10
+LLM_CLIENT_IDLE_TIMEOUT = 600
+# size of the connection pool shared by every API request
+ELASTIC_CONNECTIONS_PER_NODE = 25
+# query embeddings cache bounds, ttl in seconds
+EMBEDDING_CACHE_SIZE = 10000
+EMBEDDING_CACHE_TTL = 24 * 3600
+# ingestion pipeline: documents fetched per batch, chunking processes,
+# concurrent embedding requests, chunks per embedding request and per bulk
+# request, and bound of the queues between stages
+INGEST_FETCH_BATCH_SIZE = 100
+INGEST_CHUNK_WORKERS = 4
+INGEST_EMBED_CONCURRENCY = 4
+INGEST_EMBED_BATCH_SIZE = 64
+INGEST_QUEUE_SIZE = 16
+ELASTIC_BULK_CHUNK_SIZE = 500
+# on-disk store of the chunk embeddings computed during ingestion
+EMBEDDING_STORE_PATH = "data/embeddings.sqlite"
+# seconds between two checks of the chunks index alias by the in-memory
+# lookups (article urls...), which are reloaded when it is swapped
+INDEX_LOOKUP_REFRESH_INTERVAL = 60
+# /search responses cache bounds, ttl in seconds
+SEARCH_CACHE_SIZE = 2048
+SEARCH_CACHE_TTL = 3600
+# relevance scores cache bounds, ttl in seconds
+RERANK_CACHE_SIZE = 20000
+RERANK_CACHE_TTL = 24 * 3600
+# seconds between two attempts to load a resource of the API at startup
+STARTUP_RETRY_INTERVAL = 5
+# characters held back by the streamed answers cleaner behind an unclosed
+# bracket before it releases its complete sentences
+STREAM_CLEAN_MAX_BUFFER = 2000
+# questions anonymised together within this window (seconds) or size
+ANONYMISER_BATCH_WINDOW = 0.005
+ANONYMISER_BATCH_SIZE = 32
+# token counts kept by the tokenizer, and threads encoding a batch of texts
+TOKENIZER_CACHE_SIZE = 4096
+TOKENIZER_THREADS = 4
+# texts to encode from which the API encodes them off the event loop
+TOKENIZER_OFFLOAD_MIN_CHARS = 10000
+# upper bounds (seconds) of the stage latency histograms
+METRICS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+# knn candidates per shard (k * factor by default), capped by Elasticsearch
+KNN_NUM_CANDIDATES_FACTOR = 10
+KNN_MAX_NUM_CANDIDATES = 10000
+# HNSW options of the embedding field, int8 quantization divides the memory
+# held by the vectors by 4
+ELASTIC_VECTOR_INDEX_OPTIONS = {"type": "int8_hnsw", "m": 16, "ef_construction": 100}
+# constant used in reciprocal rank fusion
+RRF_K = 60
+# hybrid search fusion: "rrf" (rrf retriever), "linear" (knn and match scores
+# summed by Elasticsearch) or "python" (two requests fused with RRF here)
+HYBRID_FUSION = "rrf"
+# weights of the knn and match scores in linear fusion, bm25 scores are about
+# an order of magnitude above cosine similarities
+HYBRID_KNN_WEIGHT = 1.0
+HYBRID_TEXT_WEIGHT = 0.1
+# fused score multiplier of the chunks of a source, e.g. {"code_du_travail": 1.2}
+HYBRID_SOURCE_BOOSTS: dict[str, float] = {}
 SOURCES = [
     "contributions",
     "code_du_travail",
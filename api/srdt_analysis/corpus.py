@@ -1,18 +1,14 @@
 from typing import List, cast
 
-from dotenv import load_dotenv
-
 from srdt_analysis.api.schemas import ChunkResult, ContentResult
 from srdt_analysis.constants import CHUNK_INDEX
-from srdt_analysis.elastic_handler import ElasticIndicesHandler
-
-load_dotenv()
-
-es_handler = ElasticIndicesHandler()
+from srdt_analysis.elastic_handler import AsyncElasticIndicesHandler
 
 
-def getChunksByIdcc(idcc: str, score: int = 1) -> List[ChunkResult]:
-    hits = es_handler.get_idcc(CHUNK_INDEX, idcc)
+async def getChunksByIdcc(
+    es_handler: AsyncElasticIndicesHandler, idcc: str, score: int = 1
+) -> List[ChunkResult]:
+    hits = await es_handler.get_idcc(CHUNK_INDEX, idcc)
 
     def to_chunk(source):
         metadata = source["metadata"]
@@ -28,8 +24,10 @@ def getChunksByIdcc(idcc: str, score: int = 1) -> List[ChunkResult]:
     return cast(List[ChunkResult], chunks)
 
 
-def getDocsContent(ids: List[str]) -> List[ContentResult]:
-    hits = es_handler.get_chunks(CHUNK_INDEX, ids)
+async def getDocsContent(
+    es_handler: AsyncElasticIndicesHandler, ids: List[str]
+) -> List[ContentResult]:
+    hits = await es_handler.get_chunks(CHUNK_INDEX, ids)
 
     doc_chunks = {}
 
@@ -4,6 +4,11 @@ from typing import TypeVar
 from srdt_analysis.chunker import Chunker
 from srdt_analysis.collections import AlbertCollectionHandler
 from srdt_analysis.constants import BASE_URL_CDTN
+from srdt_analysis.embedding_store import (
+    content_hash,
+    document_hash,
+    get_embedding_store,
+)
 from srdt_analysis.logger import Logger
 from srdt_analysis.models import (
     Chunk,
@@ -35,7 +40,33 @@ class BaseDataExploiter:
     def get_content(self, _doc: Document) -> FormattedTextContent:
         raise NotImplementedError("Subclasses should implement this method")
 
-    def process_documents(
+    def get_url(self, doc: Document) -> str:
+        return (
+            BASE_URL_CDTN
+            + "/"
+            + self._get_path_from_collection_name(doc.source)
+            + "/"
+            + doc.slug
+        )
+
+    def get_document_hash(
+        self,
+        doc: Document,
+        content: FormattedTextContent,
+        chunker_content_type: ChunkerContentType,
+    ) -> str:
+        return document_hash(
+            content,
+            {
+                "title": doc.title,
+                "url": self.get_url(doc),
+                "idcc": doc.idcc,
+                "source": doc.source,
+            },
+            self.chunker.settings(chunker_content_type),
+        )
+
+    def chunk_documents(
         self,
         data: DocumentsList,
         chunker_content_type: ChunkerContentType,
@@ -46,6 +77,7 @@ class BaseDataExploiter:
             content = self.get_content(doc)
             chunks = self.chunker.split(content, chunker_content_type)
             doc_data = self.create_document_data(doc, content, chunks)
+            doc_hash = self.get_document_hash(doc, content, chunker_content_type)
 
             for idx, ds in enumerate(doc_data["content_chunked"]):
                 chunk_list.append(
@@ -62,22 +94,25 @@ class BaseDataExploiter:
                             "title": doc_data["title"],
                             "idcc": doc_data["idcc"],
                             "articles": None,
+                            "document_hash": doc_hash,
+                            "chunk_hash": content_hash(ds.page_content),
                         },
                     }
                 )
 
+        return chunk_list
+
+    def embed_chunks(self, chunk_list: list[Chunk]) -> None:
         # run batches of 64 chunks to get embeddings
         batches = make_batches(chunk_list, 64)
 
         for docs in batches:
             contents = [doc["content"] for doc in docs]
-            embeddings = self.albert.embeddings(contents)
+            embeddings = get_embedding_store().embeddings(self.albert, contents)
 
             for doc, emb in zip(docs, embeddings):
                 doc["embedding"] = emb  # type: ignore
 
-        return chunk_list
-
     def create_document_data(self, doc, content, content_chunked) -> DocumentData:
         return {
             "cdtn_id": doc.cdtn_id,
@@ -85,11 +120,7 @@ class BaseDataExploiter:
             "title": doc.title,
             "content": content,
             "content_chunked": content_chunked,
-            "url": BASE_URL_CDTN
-            + "/"
-            + self._get_path_from_collection_name(doc.source)
-            + "/"
-            + doc.slug,
+            "url": self.get_url(doc),
             "source": doc.source,
             "idcc": doc.idcc,
             "articles": None,
@@ -1,19 +1,47 @@
 import os
 import random
+import re
 from collections import defaultdict
-from timeit import default_timer as timer
-from typing import List
-
-from elasticsearch import Elasticsearch
+from datetime import datetime
+from typing import Any, Iterable, List, Optional
+
+from elastic_transport import HttpxAsyncHttpNode
+from elasticsearch import (
+    ApiError,
+    AsyncElasticsearch,
+    Elasticsearch,
+    NotFoundError,
+    helpers,
+)
 
 from srdt_analysis.api.schemas import ChunkMetadata, ChunkResult
-from srdt_analysis.collections import AlbertCollectionHandler
+from srdt_analysis.collections import (
+    AlbertCollectionHandler,
+    AsyncAlbertCollectionHandler,
+)
+from srdt_analysis.constants import (
+    ELASTIC_BULK_CHUNK_SIZE,
+    ELASTIC_CONNECTIONS_PER_NODE,
+    ELASTIC_REQUEST_TIMEOUT,
+    ELASTIC_VECTOR_INDEX_OPTIONS,
+    GENERIC_IDCC,
+    HYBRID_FUSION,
+    HYBRID_KNN_WEIGHT,
+    HYBRID_SOURCE_BOOSTS,
+    HYBRID_TEXT_WEIGHT,
+    KNN_MAX_NUM_CANDIDATES,
+    KNN_NUM_CANDIDATES_FACTOR,
+    RRF_K,
+)
+from srdt_analysis.embedding_cache import EmbeddingCache
 from srdt_analysis.exceptions import (
     ConfigurationError,
     ExternalServiceError,
     ServiceUnavailableError,
 )
 from srdt_analysis.logger import Logger
+from srdt_analysis.metrics import timed
+from srdt_analysis.models import Chunk, IndexedChunk
 
 french_analyzer = {
     "filter": {
@@ -54,28 +82,340 @@ french_analyzer = {
 }
 
 
-class ElasticIndicesHandler:
+def chunks_mappings(dims: int) -> dict[str, Any]:
+    """Mapping of the chunks index. Only the fields that are searched are
+    indexed, the others are only kept in _source, and the embeddings are left
+    out of _source since they are never read back (the embedding store keeps
+    them for the next ingestion).
+    """
+    return {
+        "dynamic": False,
+        "_source": {"excludes": ["embedding"]},
+        "properties": {
+            "content": {"type": "text", "analyzer": "ascii_french"},
+            "embedding": {
+                "type": "dense_vector",
+                "dims": dims,
+                "index": True,
+                "similarity": "cosine",
+                "index_options": ELASTIC_VECTOR_INDEX_OPTIONS,
+            },
+            "metadata": {
+                "properties": {
+                    # only used in filters, which do not need doc values
+                    "id": {"type": "keyword", "doc_values": False},
+                    "source": {"type": "keyword", "doc_values": False},
+                    "idcc": {"type": "keyword", "doc_values": False},
+                    # aggregated by check_urls
+                    "url": {"type": "keyword"},
+                    # the article numbers are only looked up one at a time, an
+                    # object is enough, nested documents would not be used
+                    "articles": {
+                        "properties": {"num": {"type": "keyword", "doc_values": False}}
+                    },
+                }
+            },
+        },
+    }
+
+
+def reciprocal_rank_fusion(
+    rank_lists: List[List[ChunkResult]], k: int, rrf_k: int = RRF_K
+) -> List[ChunkResult]:
+    """Merge several ranked lists of chunks into a single deduplicated top k,
+    the score of each returned chunk is replaced by its RRF score.
+    """
+    res_dict: dict[str, ChunkResult] = {}
+
+    # dictionary to store RRF mapping
+    rrf_map = defaultdict(float)
+
+    # calculate RRF score for each result in each list
+    for rank_list in rank_lists:
+        for rank, item in enumerate(rank_list, 1):
+            res_dict.setdefault(item.id_chunk, item)
+            rrf_map[item.id_chunk] += 1 / (rank + rrf_k)
+
+    # sort items based on their RRF scores in descending order
+    sorted_results = sorted(rrf_map.items(), key=lambda x: x[1], reverse=True)
+
+    # copy results so that the input lists keep their original scores
+    return [
+        res_dict[id].model_copy(update={"score": score})
+        for [id, score] in sorted_results[:k]
+    ]
+
+
+# errors of the clusters that cannot run the hybrid retrievers: versions
+# without retrievers or without the rrf and linear ones, licenses without RRF
+_hybrid_unsupported_reasons = re.compile(
+    r"unknown (?:field|retriever) \[(?:retriever|rrf|linear)\]"
+    r"|unknown key for a \w+ in \[retriever\]"
+    r"|current license is non-compliant",
+    re.IGNORECASE,
+)
+
+
+class BaseElasticIndicesHandler:
+    """Configuration, query builders and result mapping shared by the sync
+    (ingestion) and async (API) handlers.
+    """
+
     def __init__(self):
         self.logger = Logger("Elastic")
-        self.api_key = os.getenv("ELASTIC_API_KEY")
-        if not self.api_key:
+        api_key = os.getenv("ELASTIC_API_KEY")
+        if not api_key:
             raise ConfigurationError(
                 "ELASTIC_API_KEY environment variable is not set",
                 service="Elasticsearch",
             )
+        self.api_key: str = api_key
 
-        self.base_url = os.getenv("ELASTIC_HOSTNAME")
-        if not self.base_url:
+        base_url = os.getenv("ELASTIC_HOSTNAME")
+        if not base_url:
             raise ConfigurationError(
                 "ELASTIC_HOSTNAME environment variable is not set",
                 service="Elasticsearch",
             )
+        self.base_url: str = base_url
+
+        fusion = os.getenv("HYBRID_FUSION", HYBRID_FUSION)
+        if fusion not in ("rrf", "linear", "python"):
+            raise ConfigurationError(
+                f"Unknown HYBRID_FUSION {fusion}, expected rrf, linear or python",
+                service="Elasticsearch",
+            )
+        self.fusion: str = fusion
+        self.rrf_k: int = RRF_K
+        self.knn_weight: float = HYBRID_KNN_WEIGHT
+        self.text_weight: float = HYBRID_TEXT_WEIGHT
+        self.source_boosts: dict[str, float] = HYBRID_SOURCE_BOOSTS
+        # turned off the first time the cluster rejects a hybrid request
+        # (version or license), the searches are then fused in Python
+        self.native_hybrid: bool = fusion != "python"
+
+    def to_chunk_result(self, r) -> ChunkResult:
+        source = r["_source"]
+        metadataDict = source["metadata"]
+        metadata = ChunkMetadata(
+            id=metadataDict["id"],
+            source=metadataDict["source"],
+            idcc=metadataDict["idcc"],
+            title=metadataDict["title"],
+            url=metadataDict["url"],
+        )
+        return ChunkResult(
+            id_chunk=r["_id"],
+            score=r["_score"],
+            metadata=metadata,
+            content=source["content"],
+        )
+
+    def _filters(self, sources: list[str], idcc: Optional[str]) -> list[dict]:
+        filters: list[dict] = [{"terms": {"metadata.source": sources}}]
+        if idcc is not None:
+            # chunks of this convention collective, generic contributions
+            # and chunks of no convention
+            filters.append(
+                {
+                    "bool": {
+                        "should": [
+                            {"term": {"metadata.idcc": idcc}},
+                            {"term": {"metadata.idcc": GENERIC_IDCC}},
+                            {
+                                "bool": {
+                                    "must_not": {"exists": {"field": "metadata.idcc"}}
+                                }
+                            },
+                        ],
+                        "minimum_should_match": 1,
+                    }
+                }
+            )
+        return filters
+
+    def _knn(
+        self,
+        embeddings: list[float],
+        k: int,
+        filters: list[dict],
+        num_candidates: Optional[int],
+    ) -> dict[str, Any]:
+        candidates = (
+            num_candidates
+            if num_candidates is not None
+            else k * KNN_NUM_CANDIDATES_FACTOR
+        )
+        # the filter is applied during the HNSW search, so that k hits of the
+        # requested sources are returned even when another source ranks higher
+        return {
+            "field": "embedding",
+            "query_vector": embeddings,
+            "num_candidates": min(max(candidates, k), KNN_MAX_NUM_CANDIDATES),
+            "k": k,
+            "filter": filters,
+        }
+
+    def _text_search_params(
+        self, index_name, query, k, sources: list[str], idcc: Optional[str] = None
+    ) -> dict[str, Any]:
+        return {
+            "index": index_name,
+            "size": k,
+            "query": {
+                "bool": {
+                    "must": [{"match": {"content": query}}],
+                    "filter": self._filters(sources, idcc),
+                }
+            },
+            "source_includes": ["content", "metadata"],
+        }
+
+    def _knn_search_params(
+        self,
+        index_name,
+        embeddings: list[float],
+        k,
+        sources: list[str],
+        idcc: Optional[str] = None,
+        num_candidates: Optional[int] = None,
+    ) -> dict[str, Any]:
+        return {
+            "index": index_name,
+            "knn": self._knn(
+                embeddings, k, self._filters(sources, idcc), num_candidates
+            ),
+            "size": k,
+            "source_includes": ["content", "metadata"],
+        }
+
+    def _hybrid_search_params(
+        self,
+        index_name,
+        query,
+        embeddings: list[float],
+        k,
+        sources: list[str],
+        idcc: Optional[str] = None,
+        num_candidates: Optional[int] = None,
+    ) -> dict[str, Any]:
+        filters = self._filters(sources, idcc)
+        knn = self._knn(embeddings, k, filters, num_candidates)
+        match = {
+            "bool": {
+                "must": [{"match": {"content": query}}],
+                "filter": filters,
+            }
+        }
+        if self.fusion == "rrf":
+            return {
+                "index": index_name,
+                "size": k,
+                "retriever": {
+                    "rrf": {
+                        "retrievers": [{"knn": knn}, {"standard": {"query": match}}],
+                        "rank_constant": self.rrf_k,
+                        "rank_window_size": k,
+                    }
+                },
+                "source_includes": ["content", "metadata"],
+            }
+        # linear: the score of each hit is the weighted sum of both scores
+        return {
+            "index": index_name,
+            "size": k,
+            "knn": {**knn, "boost": self.knn_weight},
+            "query": {"bool": {**match["bool"], "boost": self.text_weight}},
+            "source_includes": ["content", "metadata"],
+        }
+
+    def _apply_source_boosts(
+        self, results: List[ChunkResult], k: int
+    ) -> List[ChunkResult]:
+        if not self.source_boosts:
+            return results[:k]
+        boosted = [
+            result.model_copy(
+                update={
+                    "score": result.score
+                    * self.source_boosts.get(result.metadata.source, 1.0)
+                }
+            )
+            for result in results
+        ]
+        boosted.sort(key=lambda result: result.score, reverse=True)
+        return boosted[:k]
+
+    def _hybrid_unsupported(self, e: ApiError) -> bool:
+        """Whether the cluster cannot run the hybrid retrievers, then the
+        searches are fused in Python from now on. Any other error, a bad
+        request or an authentication failure, is not a reason to fall back.
+        """
+        if e.status_code not in (400, 403) or not (
+            _hybrid_unsupported_reasons.search(str(e))
+            or _hybrid_unsupported_reasons.search(str(e.body))
+        ):
+            return False
+        if self.native_hybrid:
+            self.native_hybrid = False
+            self.logger.warning(
+                f"Native hybrid search unsupported ({e}), "
+                "falling back to fusion in Python"
+            )
+        return True
+
+    def _idcc_params(self, index_name: str, idcc: str) -> dict[str, Any]:
+        return {
+            "index": index_name,
+            "query": {"term": {"metadata.idcc": idcc}},
+            "size": 1000,
+            "source_includes": ["content", "metadata"],
+        }
+
+    def _chunks_params(self, index_name: str, doc_ids: List[str]) -> dict[str, Any]:
+        return {
+            "index": index_name,
+            "query": {"terms": {"metadata.id": doc_ids}},
+            "size": 1000,
+            "source_includes": ["content", "metadata"],
+        }
+
+    def _article_node_params(self, index_name: str, num: str) -> dict[str, Any]:
+        return {
+            "index": index_name,
+            "query": {"term": {"metadata.articles.num": num}},
+            "size": 1,
+            "source_includes": ["metadata.articles"],
+        }
+
+    def _check_urls_params(self, index_name: str, urls: list[str]) -> dict[str, Any]:
+        return {
+            "index": index_name,
+            "query": {"terms": {"metadata.url": urls}},
+            "size": 0,
+            "aggregations": {
+                "urls": {"terms": {"field": "metadata.url", "size": len(urls)}}
+            },
+        }
+
+    def _urls_check_result(self, response, urls: list[str]) -> list[tuple[str, bool]]:
+        buckets = [b["key"] for b in response["aggregations"]["urls"]["buckets"]]
+        return [(url, url in buckets) for url in urls]
+
+
+class ElasticIndicesHandler(BaseElasticIndicesHandler):
+    """Handler of the ingestion and scripts: index management and bulk
+    writes. Searches go through AsyncElasticIndicesHandler.
+    """
+
+    def __init__(self):
+        super().__init__()
 
         self.client = Elasticsearch(
             [self.base_url],
             basic_auth=self.api_key,
             verify_certs=False,
-            request_timeout=30,
+            request_timeout=ELASTIC_REQUEST_TIMEOUT,
         )
 
         self.albert = AlbertCollectionHandler()
@@ -117,15 +457,87 @@ class ElasticIndicesHandler:
 
         self.client.bulk(index=index_name, operations=operations, refresh=True)
 
-    def init_index_default(self, index_name):
+    def chunk_id(self, item: Chunk) -> str:
+        # deterministic so that re-ingesting a chunk overwrites it
+        return f"{item['id']}-{item['metadata']['idx']}"
+
+    def stream_items(self, index_name, items: Iterable[Chunk]) -> int:
+        """Bulk index items as they are produced, in requests of
+        ELASTIC_BULK_CHUNK_SIZE documents, and return the number indexed.
+        """
+        indexed = 0
+        for ok, _ in helpers.streaming_bulk(
+            self.client,
+            (
+                {"_index": index_name, "_id": self.chunk_id(item), "_source": item}
+                for item in items
+            ),
+            chunk_size=ELASTIC_BULK_CHUNK_SIZE,
+            raise_on_error=True,
+        ):
+            if ok:
+                indexed += 1
+        self.client.indices.refresh(index=index_name)
+        return indexed
+
+    def delete_items(self, index_name, ids: Iterable[str]) -> int:
+        deleted = 0
+        for ok, _ in helpers.streaming_bulk(
+            self.client,
+            ({"_op_type": "delete", "_index": index_name, "_id": id} for id in ids),
+            chunk_size=ELASTIC_BULK_CHUNK_SIZE,
+            raise_on_error=False,
+        ):
+            if ok:
+                deleted += 1
+        self.client.indices.refresh(index=index_name)
+        return deleted
+
+    def get_indexed_chunks(self, index_name) -> dict[str, IndexedChunk]:
+        chunks: dict[str, IndexedChunk] = {}
+        for hit in helpers.scan(
+            self.client,
+            index=index_name,
+            query={
+                "query": {"match_all": {}},
+                "_source": [
+                    "metadata.id",
+                    "metadata.source",
+                    "metadata.document_hash",
+                    "metadata.chunk_hash",
+                ],
+            },
+        ):
+            metadata = hit["_source"]["metadata"]
+            chunks[hit["_id"]] = IndexedChunk(
+                document_id=metadata["id"],
+                source=metadata["source"],
+                document_hash=metadata.get("document_hash"),
+                chunk_hash=metadata.get("chunk_hash"),
+            )
+        return chunks
+
+    def get_ingested_at(self, index_name) -> Optional[datetime]:
+        if not self.client.indices.exists(index=index_name):
+            return None
+        response = self.client.indices.get_mapping(index=index_name)
+        for mapping in response.body.values():
+            ingested_at = mapping["mappings"].get("_meta", {}).get("ingested_at")
+            return datetime.fromisoformat(ingested_at) if ingested_at else None
+        return None
+
+    def set_ingested_at(self, index_name, ingested_at: datetime):
+        self.client.indices.put_mapping(
+            index=index_name, meta={"ingested_at": ingested_at.isoformat()}
+        )
+
+    def init_index_default(self, index_name, dims: Optional[int] = None):
+        if dims is None:
+            dims = len(self.albert.embeddings(["dims"])[0])
         return self.init_index(
             {
                 "name": index_name,
-                "mappings": {
-                    "properties": {
-                        "content": {"type": "text", "analyzer": "ascii_french"}
-                    }
-                },
+                "mappings": chunks_mappings(dims),
                 "settings": {"analysis": french_analyzer},
             }
         )
@@ -135,61 +547,104 @@ class ElasticIndicesHandler:
         self.add_items(alias, items)
         self.swap_aliases(index_name, alias)
 
-    def to_chunk_result(self, r) -> ChunkResult:
-        source = r["_source"]
-        metadataDict = source["metadata"]
-        metadata = ChunkMetadata(
-            id=metadataDict["id"],
-            source=metadataDict["source"],
-            idcc=metadataDict["idcc"],
-            title=metadataDict["title"],
-            url=metadataDict["url"],
-        )
-        return ChunkResult(
-            id_chunk=r["_id"],
-            score=r["_score"],
-            metadata=metadata,
-            content=source["content"],
+    def get_article_node(self, index_name: str, num: str):
+        try:
+            response = self.client.search(**self._article_node_params(index_name, num))
+            return [hit["_source"] for hit in response["hits"]["hits"]]
+        except Exception as e:
+            raise ExternalServiceError(
+                f"Elasticsearch query error: {str(e)}", service="Elasticsearch"
+            ) from e
+
+
+class AsyncElasticIndicesHandler(BaseElasticIndicesHandler):
+    """Read-only handler used by the API, it wraps a single process-wide
+    AsyncElasticsearch client so that every request reuses the same
+    connection pool instead of opening new connections.
+    """
+
+    def __init__(
+        self,
+        client: Optional[AsyncElasticsearch] = None,
+        albert: Optional[AsyncAlbertCollectionHandler] = None,
+    ):
+        super().__init__()
+
+        self.client = client if client is not None else self.create_client()
+
+        # the Albert client is closed here only when this handler created it
+        self._owns_albert = albert is None
+        self.albert = albert if albert is not None else AsyncAlbertCollectionHandler()
+
+        self.embedding_cache = EmbeddingCache(path=os.getenv("EMBEDDING_CACHE_PATH"))
+
+    def create_client(self) -> AsyncElasticsearch:
+        return AsyncElasticsearch(
+            [self.base_url],
+            basic_auth=self.api_key,
+            verify_certs=False,
+            request_timeout=ELASTIC_REQUEST_TIMEOUT,
+            node_class=HttpxAsyncHttpNode,
+            connections_per_node=ELASTIC_CONNECTIONS_PER_NODE,
         )
 
-    def find_most_similar_text(
-        self, index_name, query, k, sources: list[str]
+    async def close(self):
+        await self.client.close()
+        if self._owns_albert:
+            await self.albert.close()
+        self.embedding_cache.close()
+
+    async def check_connection(self):
+        try:
+            return await self.client.info()
+        except Exception as e:
+            raise ServiceUnavailableError(
+                f"Elasticsearch unreachable: {str(e)}", service="Elasticsearch"
+            ) from e
+
+    async def embed_query(self, query: str) -> list[float]:
+        # the same rephrased questions come back often, skip the Albert round-trip
+        cached = await self.embedding_cache.get(self.albert.model, query)
+        if cached is not None:
+            return cached
+
+        with timed("albert_embedding"):
+            embedding = (await self.albert.embeddings([query]))[0]
+        self.embedding_cache.set(self.albert.model, query, embedding)
+        return embedding
+
+    async def find_most_similar_text(
+        self, index_name, query, k, sources: list[str], idcc: Optional[str] = None
     ) -> list[ChunkResult]:
         try:
-            response = self.client.search(
-                index=index_name,
-                size=k,
-                query={
-                    "bool": {
-                        "must": [{"match": {"content": query}}],
-                        "filter": [{"terms": {"metadata.source": sources}}],
-                    }
-                },
-                source_includes=["content", "metadata"],
-            )
+            with timed("es_bm25", collection=",".join(sorted(sources))):
+                response = await self.client.search(
+                    **self._text_search_params(index_name, query, k, sources, idcc)
+                )
             return [self.to_chunk_result(hit) for hit in response["hits"]["hits"][:k]]
         except Exception as e:
             raise ExternalServiceError(
                 f"Elasticsearch error - text search : {str(e)}", service="Elasticsearch"
             ) from e
 
-    def find_most_similar_knn(self, index_name, query, k, sources: list[str]):
-        embeddings = self.albert.embeddings([query])[0]
+    async def find_most_similar_knn(
+        self,
+        index_name,
+        query,
+        k,
+        sources: list[str],
+        idcc: Optional[str] = None,
+        num_candidates: Optional[int] = None,
+    ) -> list[ChunkResult]:
+        embeddings = await self.embed_query(query)
 
-        # sources filter do not work properly if not every sources has been ingested
-        # i.e. if the there are no results for the required source, it will return results for other sources
         try:
-            response = self.client.search(
-                query={"terms": {"metadata.source": sources}},
-                index=index_name,
-                knn={
-                    "field": "embedding",
-                    "query_vector": embeddings,
-                    "num_candidates": k * 1.5,
-                    "k": k,
-                },
-                size=k,
-            )
+            with timed("es_knn", collection=",".join(sorted(sources))):
+                response = await self.client.search(
+                    **self._knn_search_params(
+                        index_name, embeddings, k, sources, idcc, num_candidates
+                    )
+                )
             return [self.to_chunk_result(hit) for hit in response["hits"]["hits"][:k]]
         except Exception as e:
             raise ExternalServiceError(
@@ -197,27 +652,60 @@ class ElasticIndicesHandler:
                 service="Elasticsearch",
             ) from e
 
-    def get_idcc(self, index_name: str, idcc: str):
+    async def find_most_similar_hybrid(
+        self,
+        index_name,
+        query,
+        k,
+        sources: list[str],
+        idcc: Optional[str] = None,
+        num_candidates: Optional[int] = None,
+    ) -> Optional[list[ChunkResult]]:
+        """KNN and text searches fused by Elasticsearch in a single request,
+        None when the cluster does not support it.
+        """
+        embeddings = await self.embed_query(query)
+
         try:
-            response = self.client.search(
-                index=index_name,
-                query={"term": {"metadata.idcc.keyword": idcc}},
-                size=1000,
-                source_includes=["content", "metadata"],
-            )
+            with timed("es_hybrid", collection=",".join(sorted(sources))):
+                response = await self.client.search(
+                    **self._hybrid_search_params(
+                        index_name,
+                        query,
+                        embeddings,
+                        k,
+                        sources,
+                        idcc,
+                        num_candidates,
+                    )
+                )
+            return [self.to_chunk_result(hit) for hit in response["hits"]["hits"][:k]]
+        except ApiError as e:
+            if self._hybrid_unsupported(e):
+                return None
+            raise ExternalServiceError(
+                f"Elasticsearch error - hybrid search : {str(e)}",
+                service="Elasticsearch",
+            ) from e
+        except Exception as e:
+            raise ExternalServiceError(
+                f"Elasticsearch error - hybrid search : {str(e)}",
+                service="Elasticsearch",
+            ) from e
+
+    async def get_idcc(self, index_name: str, idcc: str):
+        try:
+            response = await self.client.search(**self._idcc_params(index_name, idcc))
             return [hit["_source"] for hit in response["hits"]["hits"]]
         except Exception as e:
             raise ExternalServiceError(
                 f"Elasticsearch query error: {str(e)}", service="Elasticsearch"
             ) from e
 
-    def get_chunks(self, index_name: str, doc_ids: List[str]):
+    async def get_chunks(self, index_name: str, doc_ids: List[str]):
         try:
-            response = self.client.search(
-                index=index_name,
-                query={"terms": {"metadata.id.keyword": doc_ids}},
-                size=1000,
-                source_includes=["content", "metadata"],
+            response = await self.client.search(
+                **self._chunks_params(index_name, doc_ids)
             )
             return [hit["_source"] for hit in response["hits"]["hits"]]
         except Exception as e:
@@ -225,13 +713,10 @@ class ElasticIndicesHandler:
                 f"Elasticsearch query error: {str(e)}", service="Elasticsearch"
             ) from e
 
-    def get_article_node(self, index_name: str, num: str):
+    async def get_article_node(self, index_name: str, num: str):
         try:
-            response = self.client.search(
-                index=index_name,
-                query={"term": {"metadata.articles.num.keyword": num}},
-                size=1,
-                source_includes=["metadata.articles"],
+            response = await self.client.search(
+                **self._article_node_params(index_name, num)
             )
             return [hit["_source"] for hit in response["hits"]["hits"]]
         except Exception as e:
@@ -239,68 +724,126 @@ class ElasticIndicesHandler:
                 f"Elasticsearch query error: {str(e)}", service="Elasticsearch"
             ) from e
 
-    def search(
-        self, index_name: str, prompt: str, k: int, hybrid: bool, sources: list[str]
+    async def resolve_alias(self, index_name: str) -> str:
+        """Name of the index `index_name` points to, itself if not an alias."""
+        try:
+            response = await self.client.indices.get_alias(name=index_name)
+            return next(iter(response.body))
+        except NotFoundError:
+            return index_name
+        except Exception as e:
+            raise ExternalServiceError(
+                f"Elasticsearch query error: {str(e)}", service="Elasticsearch"
+            ) from e
+
+    async def get_urls(self, index_name: str) -> frozenset[str]:
+        """Every distinct url of the index, paged with a composite aggregation."""
+        urls: set[str] = set()
+        after: Optional[dict] = None
+        try:
+            while True:
+                composite: dict[str, Any] = {
+                    "size": ELASTIC_BULK_CHUNK_SIZE,
+                    "sources": [{"url": {"terms": {"field": "metadata.url"}}}],
+                }
+                if after is not None:
+                    composite["after"] = after
+                response = await self.client.search(
+                    index=index_name,
+                    size=0,
+                    aggregations={"urls": {"composite": composite}},
+                )
+                aggregation = response["aggregations"]["urls"]
+                urls.update(bucket["key"]["url"] for bucket in aggregation["buckets"])
+                after = aggregation.get("after_key")
+                if after is None or not aggregation["buckets"]:
+                    return frozenset(urls)
+        except Exception as e:
+            raise ExternalServiceError(
+                f"Elasticsearch query error: {str(e)}", service="Elasticsearch"
+            ) from e
+
+    async def get_article_urls(self, index_name: str) -> dict[str, str]:
+        """Legifrance URL of every article number of the index."""
+        urls: dict[str, str] = {}
+        try:
+            async for hit in helpers.async_scan(
+                self.client,
+                index=index_name,
+                query={
+                    "query": {"exists": {"field": "metadata.articles.num"}},
+                    "_source": ["metadata.articles"],
+                },
+                size=ELASTIC_BULK_CHUNK_SIZE,
+            ):
+                for article in hit["_source"]["metadata"]["articles"] or []:
+                    urls.setdefault(article["num"], article["url"])
+        except Exception as e:
+            raise ExternalServiceError(
+                f"Elasticsearch query error: {str(e)}", service="Elasticsearch"
+            ) from e
+        return urls
+
+    async def search(
+        self,
+        index_name: str,
+        prompt: str,
+        k: int,
+        hybrid: bool,
+        sources: list[str],
+        idcc: Optional[str] = None,
+        num_candidates: Optional[int] = None,
     ) -> List[ChunkResult]:
+        """Top k chunks of `sources` for `prompt`, restricted to the chunks
+        of the convention collective `idcc` and of no convention when given.
+        `num_candidates` trades KNN latency for recall.
+        """
         k_min = 64 if k < 64 else k
 
-        start = timer()
-
-        knn_res = self.find_most_similar_knn(
-            query=prompt, index_name=index_name, k=k_min, sources=sources
+        if hybrid and self.native_hybrid:
+            res = await self.find_most_similar_hybrid(
+                query=prompt,
+                index_name=index_name,
+                k=k_min,
+                sources=sources,
+                idcc=idcc,
+                num_candidates=num_candidates,
+            )
+            if res is not None:
+                return self._apply_source_boosts(res, k)
+
+        knn_res = await self.find_most_similar_knn(
+            query=prompt,
+            index_name=index_name,
+            k=k_min,
+            sources=sources,
+            idcc=idcc,
+            num_candidates=num_candidates,
         )
 
-        knn_time = timer() - start
-        self.logger.debug(f"Elapsed KNN {knn_time}s")
-
         if not hybrid:
             return knn_res[:k]
 
-        start = timer()
-
-        text_res = self.find_most_similar_text(
-            query=prompt, index_name=index_name, k=k_min, sources=sources
+        text_res = await self.find_most_similar_text(
+            query=prompt, index_name=index_name, k=k_min, sources=sources, idcc=idcc
         )
 
-        text_time = timer() - start
-        self.logger.debug(f"Elapsed Text {text_time}s")
-
         if len(text_res) == 0:
             return knn_res[:k]
 
-        start = timer()
-
-        res_dict = {r.id_chunk: r for r in knn_res + text_res}
-
-        # dictionary to store RRF mapping
-        rrf_map = defaultdict(float)
-
-        # calculate RRF score for each result in each list
-        for rank_list in [r.id_chunk for r in knn_res], [r.id_chunk for r in text_res]:
-            for rank, item in enumerate(rank_list, 1):
-                # 60 : constant used in rrf
-                rrf_map[item] += 1 / (rank + 60)
-
-        # sort items based on their RRF scores in descending order
-        sorted_results = sorted(rrf_map.items(), key=lambda x: x[1], reverse=True)
-
-        # replace score with rff score
-        def update_score(elem, rff_score):
-            elem.score = rff_score
-            return elem
-
-        return [update_score(res_dict[id], score) for [id, score] in sorted_results[:k]]
+        with timed("rrf_fusion"):
+            return self._apply_source_boosts(
+                reciprocal_rank_fusion([knn_res, text_res], k_min, self.rrf_k), k
+            )
 
-    def check_urls(self, index_name: str, urls: list[str]) -> list[tuple[str, bool]]:
+    async def check_urls(
+        self, index_name: str, urls: list[str]
+    ) -> list[tuple[str, bool]]:
         try:
-            response = self.client.search(
-                index=index_name,
-                query={"terms": {"metadata.url.keyword": urls}},
-                size=0,
-                aggregations={"urls": {"terms": {"field": "metadata.url.keyword"}}},
+            response = await self.client.search(
+                **self._check_urls_params(index_name, urls)
             )
-            buckets = [b["key"] for b in response["aggregations"]["urls"]["buckets"]]
-            return [(url, url in buckets) for url in urls]
+            return self._urls_check_result(response, urls)
         except Exception as e:
             raise ExternalServiceError(
                 f"Elasticsearch query error: {str(e)}", service="Elasticsearch"
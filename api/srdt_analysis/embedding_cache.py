@@ -0,0 +1,167 @@
+import asyncio
+import hashlib
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from array import array
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+from srdt_analysis.constants import EMBEDDING_CACHE_SIZE, EMBEDDING_CACHE_TTL
+from srdt_analysis.logger import Logger
+from srdt_analysis.metrics import CACHE_ENTRIES, CACHE_REQUESTS
+
+# purge expired rows of the shared store every n writes
+SHARED_STORE_PURGE_EVERY = 500
+
+
+def normalize_text(text: str) -> str:
+    normalized = unicodedata.normalize("NFC", text)
+    return re.sub(r"\s+", " ", normalized).strip()
+
+
+class EmbeddingCache:
+    """Bounded in-process cache of query embeddings, keyed on
+    (model, normalized text), with LRU eviction and a TTL.
+
+    When `path` is set, entries are also written to a sqlite file so that
+    several workers of the same host can share their embeddings. The file is
+    only accessed from a dedicated thread, never from the event loop.
+
+    Lookups are counted under cache="embedding" in /metrics.
+    """
+
+    def __init__(
+        self,
+        max_size: int = EMBEDDING_CACHE_SIZE,
+        ttl: float = EMBEDDING_CACHE_TTL,
+        path: Optional[str] = None,
+    ):
+        self.logger = Logger("EmbeddingCache")
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[tuple[str, str], tuple[float, list[float]]] = (
+            OrderedDict()
+        )
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._db: Optional[sqlite3.Connection] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        if path:
+            self._db = self._open_shared_store(path)
+            self._executor = ThreadPoolExecutor(1, thread_name_prefix="embedding-cache")
+
+    def _open_shared_store(self, path: str) -> sqlite3.Connection:
+        db = sqlite3.connect(path, timeout=5, check_same_thread=False)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS embeddings (
+                key TEXT PRIMARY KEY,
+                created_at REAL NOT NULL,
+                embedding BLOB NOT NULL
+            )
+            """
+        )
+        db.commit()
+        self.logger.info(f"Using shared embedding cache at {path}")
+        return db
+
+    def _shared_key(self, key: tuple[str, str]) -> str:
+        return hashlib.sha256("\0".join(key).encode("utf-8")).hexdigest()
+
+    def _get_shared(self, key: tuple[str, str], now: float) -> Optional[list[float]]:
+        if self._db is None:
+            return None
+        try:
+            row = self._db.execute(
+                "SELECT created_at, embedding FROM embeddings WHERE key = ?",
+                (self._shared_key(key),),
+            ).fetchone()
+        except sqlite3.Error as e:
+            self.logger.warning(f"Shared embedding cache read failed: {str(e)}")
+            return None
+        if row is None or now - row[0] > self.ttl:
+            return None
+        return array("f", row[1]).tolist()
+
+    def _set_shared(self, key: tuple[str, str], now: float, embedding: list[float]):
+        if self._db is None:
+            return
+        try:
+            self._db.execute(
+                "INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?)",
+                (self._shared_key(key), now, array("f", embedding).tobytes()),
+            )
+            self._writes += 1
+            if self._writes % SHARED_STORE_PURGE_EVERY == 0:
+                self._db.execute(
+                    "DELETE FROM embeddings WHERE created_at < ?", (now - self.ttl,)
+                )
+            self._db.commit()
+        except sqlite3.Error as e:
+            self.logger.warning(f"Shared embedding cache write failed: {str(e)}")
+
+    def _count(self, hit: bool) -> None:
+        if hit:
+            self.hits += 1
+        else:
+            self.misses += 1
+        CACHE_REQUESTS.inc(cache="embedding", result="hit" if hit else "miss")
+
+    async def get(self, model: str, text: str) -> Optional[list[float]]:
+        key = (model, normalize_text(text))
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now - entry[0] <= self.ttl:
+                self._entries.move_to_end(key)
+                self._count(hit=True)
+                return entry[1]
+
+            if entry is not None:
+                del self._entries[key]
+
+        embedding = None
+        if self._executor is not None:
+            embedding = await asyncio.get_running_loop().run_in_executor(
+                self._executor, self._get_shared, key, now
+            )
+        with self._lock:
+            if embedding is not None:
+                self._store(key, now, embedding)
+            self._count(hit=embedding is not None)
+        return embedding
+
+    def set(self, model: str, text: str, embedding: list[float]) -> None:
+        key = (model, normalize_text(text))
+        now = time.time()
+        with self._lock:
+            self._store(key, now, embedding)
+        if self._executor is not None:
+            # written in the background, the caller does not wait for it
+            self._executor.submit(self._set_shared, key, now, embedding)
+
+    def _store(self, key: tuple[str, str], now: float, embedding: list[float]):
+        self._entries[key] = (now, embedding)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+        CACHE_ENTRIES.set(len(self._entries), cache="embedding")
+
+    def stats(self) -> dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._entries)}
+
+    def close(self) -> None:
+        if self._executor is not None:
+            # pending writes to the shared store are completed first
+            self._executor.shutdown()
+            self._executor = None
+        if self._db is not None:
+            self._db.close()
+            self._db = None
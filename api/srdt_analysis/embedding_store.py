@@ -0,0 +1,141 @@
+import functools
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from array import array
+from typing import Any, Iterable, Protocol
+
+from srdt_analysis.constants import EMBEDDING_STORE_PATH
+from srdt_analysis.logger import Logger
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def document_hash(
+    content: str, metadata: dict[str, Any], chunker_settings: dict[str, Any]
+) -> str:
+    """Hash of a document as it is indexed: its content, the metadata copied
+    to its chunks and the settings it is chunked with. Incremental ingestion
+    re-indexes a document when any of them changes.
+    """
+    return content_hash(
+        json.dumps(
+            {"content": content, "metadata": metadata, "chunker": chunker_settings},
+            sort_keys=True,
+            ensure_ascii=False,
+        )
+    )
+
+
+class Embedder(Protocol):
+    model: str
+
+    def embeddings(self, chunks: list[str]) -> list[list[float]]: ...
+
+
+class EmbeddingStore:
+    """On-disk store of chunk embeddings used by ingestion, keyed on
+    (model, sha256 of the chunk text) so that unchanged chunks are never sent
+    to Albert again. Vectors are stored as float32 blobs in sqlite.
+    """
+
+    def __init__(self, path: str):
+        self.logger = Logger("EmbeddingStore")
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS embeddings (
+                model TEXT NOT NULL,
+                hash TEXT NOT NULL,
+                embedding BLOB NOT NULL,
+                PRIMARY KEY (model, hash)
+            )
+            """
+        )
+        self._db.commit()
+        self.logger.info(f"Using embedding store at {path}")
+
+    def get_many(self, model: str, hashes: Iterable[str]) -> dict[str, list[float]]:
+        hashes = list(set(hashes))
+        found: dict[str, list[float]] = {}
+        with self._lock:
+            # stay below sqlite's limit of bound parameters
+            for i in range(0, len(hashes), 500):
+                batch = hashes[i : i + 500]
+                rows = self._db.execute(
+                    f"SELECT hash, embedding FROM embeddings WHERE model = ? "
+                    f"AND hash IN ({','.join('?' * len(batch))})",
+                    [model, *batch],
+                )
+                for hash, blob in rows:
+                    found[hash] = array("f", blob).tolist()
+        return found
+
+    def put_many(self, model: str, embeddings: dict[str, list[float]]) -> None:
+        with self._lock:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?)",
+                [
+                    (model, hash, array("f", embedding).tobytes())
+                    for hash, embedding in embeddings.items()
+                ],
+            )
+            self._db.commit()
+
+    def embeddings(self, albert: Embedder, texts: list[str]) -> list[list[float]]:
+        """Embeddings of `texts`, Albert is only called for the missing ones."""
+        hashes = [content_hash(text) for text in texts]
+        found = self.get_many(albert.model, hashes)
+
+        missing = {hash: text for hash, text in zip(hashes, texts) if hash not in found}
+        if missing:
+            computed = dict(
+                zip(missing.keys(), albert.embeddings(list(missing.values())))
+            )
+            self.put_many(albert.model, computed)
+            found.update(computed)
+
+        return [found[hash] for hash in hashes]
+
+    def compact(self, model: str, referenced: set[str]) -> int:
+        """Evict the vectors of `model` whose hash is not in `referenced`,
+        return the number of vectors evicted.
+        """
+        # an empty set (e.g. an index that predates chunk hashes) would
+        # evict the whole store
+        if not referenced:
+            raise ValueError("No referenced embedding, nothing would be kept")
+        with self._lock:
+            self._db.execute("CREATE TEMP TABLE referenced (hash TEXT PRIMARY KEY)")
+            try:
+                self._db.executemany(
+                    "INSERT OR IGNORE INTO referenced VALUES (?)",
+                    [(hash,) for hash in referenced],
+                )
+                deleted = self._db.execute(
+                    "DELETE FROM embeddings WHERE model = ? "
+                    "AND hash NOT IN (SELECT hash FROM referenced)",
+                    (model,),
+                ).rowcount
+                self._db.commit()
+            finally:
+                self._db.execute("DROP TABLE referenced")
+            self._db.execute("VACUUM")
+        return deleted
+
+    def close(self) -> None:
+        self._db.close()
+
+
+@functools.cache
+def get_embedding_store() -> EmbeddingStore:
+    return EmbeddingStore(os.getenv("EMBEDDING_STORE_PATH", EMBEDDING_STORE_PATH))
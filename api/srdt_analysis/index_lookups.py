@@ -0,0 +1,99 @@
+import asyncio
+from abc import ABC, abstractmethod
+from typing import Generic, Optional, TypeVar
+
+from srdt_analysis.constants import CHUNK_INDEX, INDEX_LOOKUP_REFRESH_INTERVAL
+from srdt_analysis.elastic_handler import AsyncElasticIndicesHandler
+from srdt_analysis.logger import Logger
+
+T = TypeVar("T")
+
+
+class IndexLookup(ABC, Generic[T]):
+    """In-memory data derived from the chunks index, loaded once and reloaded
+    when the index alias is swapped to a new ingestion. The alias is checked
+    at most every `refresh_interval` seconds, on access.
+    """
+
+    def __init__(
+        self,
+        es: AsyncElasticIndicesHandler,
+        index_name: str = CHUNK_INDEX,
+        refresh_interval: float = INDEX_LOOKUP_REFRESH_INTERVAL,
+    ):
+        self.logger = Logger(type(self).__name__)
+        self.es = es
+        self.index_name = index_name
+        self.refresh_interval = refresh_interval
+        self._data: Optional[T] = None
+        self._loaded_index: Optional[str] = None
+        self._checked_at = float("-inf")
+        self._lock = asyncio.Lock()
+
+    @abstractmethod
+    async def _load(self, index_name: str) -> T:
+        """Build the data from the physical index `index_name`."""
+
+    async def data(self) -> Optional[T]:
+        """The data of the current index, None if it could never be loaded."""
+        loop = asyncio.get_running_loop()
+        if loop.time() - self._checked_at >= self.refresh_interval:
+            async with self._lock:
+                if loop.time() - self._checked_at >= self.refresh_interval:
+                    await self.refresh()
+                    self._checked_at = loop.time()
+        return self._data
+
+    async def load(self) -> bool:
+        """Load the data now, return whether it is loaded."""
+        async with self._lock:
+            await self.refresh()
+            self._checked_at = asyncio.get_running_loop().time()
+        return self._data is not None
+
+    async def refresh(self) -> None:
+        # on failure the previous data is kept, and loading is retried on the
+        # next check
+        try:
+            index_name = await self.es.resolve_alias(self.index_name)
+            if index_name == self._loaded_index:
+                return
+            self._data = await self._load(index_name)
+            self._loaded_index = index_name
+            self.logger.info(f"Loaded from {index_name}")
+        except Exception as e:
+            self.logger.warning(f"Could not load from {self.index_name}: {e}")
+
+
+class ArticleUrls(IndexLookup[dict[str, str]]):
+    """Legifrance URL of each article number of the Code du travail."""
+
+    async def _load(self, index_name: str) -> dict[str, str]:
+        return await self.es.get_article_urls(index_name)
+
+    async def get(self, num: str) -> Optional[str]:
+        urls = await self.data()
+        return urls.get(num) if urls is not None else None
+
+
+class CdtnUrls(IndexLookup[frozenset[str]]):
+    """Urls of the documents of the index, to check the links of answers."""
+
+    async def _load(self, index_name: str) -> frozenset[str]:
+        return await self.es.get_urls(index_name)
+
+    async def valid(self, urls: list[str]) -> dict[str, bool]:
+        if not urls:
+            return {}
+        known = await self.data()
+        if known is not None:
+            return {url: url in known for url in urls}
+        # not loaded yet, check them all in a single query
+        return dict(await self.es.check_urls(self.index_name, list(set(urls))))
+
+
+class IndexName(IndexLookup[str]):
+    """Physical index behind the alias, it changes with each ingestion."""
+
+    async def _load(self, index_name: str) -> str:
+        return index_name
@@ -0,0 +1,372 @@
+import asyncio
+import multiprocessing
+import queue
+import threading
+from concurrent.futures import (
+    ALL_COMPLETED,
+    FIRST_COMPLETED,
+    Future,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    wait,
+)
+from datetime import datetime, timezone
+from typing import Any, Callable, Iterable, Iterator, Optional, Sequence
+
+from srdt_analysis.collections import AlbertCollectionHandler
+from srdt_analysis.constants import (
+    INGEST_CHUNK_WORKERS,
+    INGEST_EMBED_BATCH_SIZE,
+    INGEST_EMBED_CONCURRENCY,
+    INGEST_FETCH_BATCH_SIZE,
+    INGEST_QUEUE_SIZE,
+)
+from srdt_analysis.data_exploiter_embed import (
+    BaseDataExploiter,
+    FichesMTExploiter,
+    FichesSPExploiter,
+    PageInfosExploiter,
+    PagesContributionsExploiter,
+    make_batches,
+)
+from srdt_analysis.elastic_handler import ElasticIndicesHandler
+from srdt_analysis.embedding_store import EmbeddingStore, get_embedding_store
+from srdt_analysis.logger import Logger
+from srdt_analysis.models import (
+    Chunk,
+    ChunkerContentType,
+    CollectionName,
+    DocumentsList,
+    IndexedChunk,
+)
+from srdt_analysis.postgresql_manager import PostgreSQLManager
+
+EXPLOITERS: dict[CollectionName, tuple[type[BaseDataExploiter], ChunkerContentType]] = {
+    "contributions": (PagesContributionsExploiter, "html"),
+    "contributions_idcc": (PagesContributionsExploiter, "html_contribs"),
+    "information": (PageInfosExploiter, "markdown"),
+    "page_fiche_ministere_travail": (FichesMTExploiter, "html"),
+    "fiches_service_public": (FichesSPExploiter, "character_recursive"),
+}
+
+# exploiters of a chunking worker process, built once per process
+_exploiters: dict[CollectionName, BaseDataExploiter] = {}
+
+_DONE = object()
+
+
+def chunk_documents(
+    source: CollectionName,
+    docs: DocumentsList,
+    document_hashes: Optional[dict[str, Optional[str]]] = None,
+) -> tuple[list[str], list[Chunk]]:
+    """Chunk the documents whose hash differs from `document_hashes` (all of
+    them when it is not given), return their ids and their chunks.
+    """
+    exploiter_class, chunker_content_type = EXPLOITERS[source]
+    exploiter = _exploiters.get(source)
+    if exploiter is None:
+        exploiter = _exploiters[source] = exploiter_class()
+    if document_hashes is not None:
+        docs = [
+            doc
+            for doc in docs
+            if exploiter.get_document_hash(
+                doc, exploiter.get_content(doc), chunker_content_type
+            )
+            != document_hashes.get(doc.cdtn_id)
+        ]
+    return [doc.cdtn_id for doc in docs], exploiter.chunk_documents(
+        docs, chunker_content_type
+    )
+
+
+class _Stopped(Exception):
+    """Raised in a stage when another one failed."""
+
+
+class IngestionPipeline:
+    """Fetch documents from Postgres -> chunk them on a process pool -> embed
+    them with concurrent Albert requests -> stream them into Elasticsearch.
+
+    Each stage runs in its own thread and they are connected by bounded
+    queues, so only a few batches are held in memory at any time.
+
+    In incremental mode, only documents updated since the last ingestion of
+    the index are fetched, and only those whose content changed are chunked.
+    Chunks are upserted when their hash changed, and chunks of removed or
+    shortened documents are deleted.
+    """
+
+    def __init__(
+        self,
+        index: ElasticIndicesHandler,
+        albert: Optional[AlbertCollectionHandler] = None,
+        embedding_store: Optional[EmbeddingStore] = None,
+        chunk_workers: int = INGEST_CHUNK_WORKERS,
+        embed_concurrency: int = INGEST_EMBED_CONCURRENCY,
+    ):
+        self.logger = Logger("IngestionPipeline")
+        self.index = index
+        self.albert = albert if albert is not None else AlbertCollectionHandler()
+        self.embedding_store = (
+            embedding_store if embedding_store is not None else get_embedding_store()
+        )
+        self.chunk_workers = chunk_workers
+        self.embed_concurrency = embed_concurrency
+        self._stop = threading.Event()
+        self._errors: list[BaseException] = []
+        self._incremental = False
+        self._updated_since: Optional[datetime] = None
+        self._indexed: dict[str, IndexedChunk] = {}
+        self._document_hashes: dict[str, Optional[str]] = {}
+        self._fetched_sources: set[str] = set()
+        self._live_ids: set[str] = set()
+        self._chunked_ids: set[str] = set()
+        self._produced: set[str] = set()
+        self._extra_sources: set[str] = set()
+
+    def run(
+        self,
+        index_name: str,
+        sources: Sequence[CollectionName],
+        extra_chunks: Iterable[Chunk] = (),
+        incremental: bool = False,
+    ) -> int:
+        """Ingest the documents of `sources`, then `extra_chunks` which are
+        already chunked and complete, into `index_name`. Return the number of
+        chunks indexed.
+        """
+        started_at = datetime.now(timezone.utc)
+        self._stop = threading.Event()
+        self._errors = []
+        self._incremental = incremental
+        self._updated_since = None
+        self._indexed = {}
+        self._document_hashes = {}
+        self._fetched_sources = set(sources)
+        self._live_ids = set()
+        self._chunked_ids = set()
+        self._produced = set()
+        self._extra_sources = set()
+
+        if incremental:
+            self._updated_since = self.index.get_ingested_at(index_name)
+            self._indexed = self.index.get_indexed_chunks(index_name)
+            self._document_hashes = {
+                chunk.document_id: chunk.document_hash
+                for chunk in self._indexed.values()
+            }
+            self.logger.info(
+                f"Incremental ingestion of documents updated since "
+                f"{self._updated_since}, {len(self._indexed)} chunks indexed"
+            )
+
+        documents: queue.Queue = queue.Queue(INGEST_QUEUE_SIZE)
+        chunks: queue.Queue = queue.Queue(INGEST_QUEUE_SIZE)
+        embedded: queue.Queue = queue.Queue(INGEST_QUEUE_SIZE)
+
+        stages = [
+            self._start(self._fetch, sources, documents),
+            self._start(self._chunk, documents, extra_chunks, chunks),
+            self._start(self._embed, chunks, embedded),
+        ]
+
+        indexed = 0
+        try:
+            indexed = self.index.stream_items(index_name, self._drain(embedded))
+        except _Stopped:
+            pass
+        finally:
+            self._stop.set()
+            for stage in stages:
+                stage.join()
+
+        if self._errors:
+            raise self._errors[0]
+
+        if incremental:
+            deleted = self.index.delete_items(index_name, self._stale_chunk_ids())
+            self.logger.info(f"Deleted {deleted} stale chunks")
+        self.index.set_ingested_at(index_name, started_at)
+
+        return indexed
+
+    def _stale_chunk_ids(self) -> list[str]:
+        stale = []
+        for id, chunk in self._indexed.items():
+            if id in self._produced:
+                continue
+            if (
+                chunk.document_id in self._chunked_ids
+                or chunk.source in self._extra_sources
+                or (
+                    chunk.source in self._fetched_sources
+                    and chunk.document_id not in self._live_ids
+                )
+            ):
+                stale.append(id)
+        return stale
+
+    def _select(self, chunks: list[Chunk]) -> list[Chunk]:
+        """Keep the chunks to (re)index: all of them in a full ingestion, only
+        the new or changed ones in incremental mode.
+        """
+        if not self._incremental:
+            return chunks
+        selected = []
+        for chunk in chunks:
+            id = self.index.chunk_id(chunk)
+            self._produced.add(id)
+            indexed = self._indexed.get(id)
+            metadata = chunk["metadata"]
+            # the chunk hash is of the content only, a chunk whose document
+            # metadata changed is upserted too
+            if (
+                indexed is None
+                or indexed.chunk_hash != metadata["chunk_hash"]
+                or indexed.document_hash != metadata["document_hash"]
+            ):
+                selected.append(chunk)
+        return selected
+
+    def _start(self, target: Callable[..., None], *args: Any) -> threading.Thread:
+        def run():
+            try:
+                target(*args)
+            except _Stopped:
+                pass
+            except BaseException as e:
+                self.logger.error(f"Ingestion stage {target.__name__} failed: {e}")
+                self._errors.append(e)
+                self._stop.set()
+
+        thread = threading.Thread(target=run, name=target.__name__, daemon=True)
+        thread.start()
+        return thread
+
+    def _put(self, q: queue.Queue, item: Any) -> None:
+        while True:
+            if self._stop.is_set():
+                raise _Stopped()
+            try:
+                q.put(item, timeout=0.5)
+                return
+            except queue.Full:
+                continue
+
+    def _get(self, q: queue.Queue) -> Any:
+        while True:
+            if self._stop.is_set():
+                raise _Stopped()
+            try:
+                return q.get(timeout=0.5)
+            except queue.Empty:
+                continue
+
+    def _drain(self, q: queue.Queue) -> Iterator[Chunk]:
+        while (batch := self._get(q)) is not _DONE:
+            yield from batch
+
+    def _forward(
+        self, pending: set[Future], out: queue.Queue, return_when: str
+    ) -> set[Future]:
+        done, not_done = wait(pending, return_when=return_when)
+        for future in done:
+            for batch in make_batches(future.result(), INGEST_EMBED_BATCH_SIZE):
+                self._put(out, batch)
+        return not_done
+
+    def _forward_chunked(
+        self, pending: set[Future], out: queue.Queue, return_when: str
+    ) -> set[Future]:
+        done, not_done = wait(pending, return_when=return_when)
+        for future in done:
+            chunked_ids, chunks = future.result()
+            self._chunked_ids.update(chunked_ids)
+            for batch in make_batches(self._select(chunks), INGEST_EMBED_BATCH_SIZE):
+                self._put(out, batch)
+        return not_done
+
+    def _fetch(self, sources: Sequence[CollectionName], out: queue.Queue) -> None:
+        asyncio.run(self._fetch_async(sources, out))
+        self._put(out, _DONE)
+
+    async def _fetch_async(
+        self, sources: Sequence[CollectionName], out: queue.Queue
+    ) -> None:
+        db = PostgreSQLManager()
+        try:
+            for source in sources:
+                if self._incremental:
+                    # documents no longer published are deleted from the index
+                    live_ids = await db.fetch_document_ids_by_source(source)
+                    self._live_ids.update(live_ids)
+                count = 0
+                async for docs in db.iter_documents_by_source(
+                    source, INGEST_FETCH_BATCH_SIZE, self._updated_since
+                ):
+                    await asyncio.to_thread(self._put, out, (source, docs))
+                    count += len(docs)
+                self.logger.info(f"Fetched {count} documents from {source}")
+        finally:
+            await db.close()
+
+    def _chunk(
+        self, documents: queue.Queue, extra_chunks: Iterable[Chunk], out: queue.Queue
+    ) -> None:
+        # spawn, forking a process that runs threads is unsafe
+        with ProcessPoolExecutor(
+            self.chunk_workers, mp_context=multiprocessing.get_context("spawn")
+        ) as pool:
+            pending: set[Future] = set()
+            while (item := self._get(documents)) is not _DONE:
+                source, docs = item
+                document_hashes = (
+                    {
+                        doc.cdtn_id: self._document_hashes.get(doc.cdtn_id)
+                        for doc in docs
+                    }
+                    if self._incremental
+                    else None
+                )
+                pending.add(pool.submit(chunk_documents, source, docs, document_hashes))
+                if len(pending) >= self.chunk_workers * 2:
+                    pending = self._forward_chunked(pending, out, FIRST_COMPLETED)
+            self._forward_chunked(pending, out, ALL_COMPLETED)
+
+        batch: list[Chunk] = []
+        for chunk in extra_chunks:
+            self._extra_sources.add(chunk["metadata"]["source"])
+            batch.append(chunk)
+            if len(batch) >= INGEST_EMBED_BATCH_SIZE:
+                self._put_selected(out, batch)
+                batch = []
+        if batch:
+            self._put_selected(out, batch)
+
+        self._put(out, _DONE)
+
+    def _put_selected(self, out: queue.Queue, batch: list[Chunk]) -> None:
+        selected = self._select(batch)
+        if selected:
+            self._put(out, selected)
+
+    def _embed_batch(self, batch: list[Chunk]) -> list[Chunk]:
+        embeddings = self.embedding_store.embeddings(
+            self.albert, [chunk["content"] for chunk in batch]
+        )
+        for chunk, embedding in zip(batch, embeddings):
+            chunk["embedding"] = embedding  # type: ignore
+        return batch
+
+    def _embed(self, chunks: queue.Queue, out: queue.Queue) -> None:
+        with ThreadPoolExecutor(self.embed_concurrency) as pool:
+            pending: set[Future] = set()
+            while (batch := self._get(chunks)) is not _DONE:
+                pending.add(pool.submit(self._embed_batch, batch))
+                if len(pending) >= self.embed_concurrency:
+                    pending = self._forward(pending, out, FIRST_COMPLETED)
+            self._forward(pending, out, ALL_COMPLETED)
+
+        self._put(out, _DONE)
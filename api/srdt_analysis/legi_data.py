@@ -1,26 +1,26 @@
+import functools
 import json
 import os
-from typing import Optional
-
-from dotenv import load_dotenv
+import re
+from typing import IO, Any, Iterator, Optional
 
 from srdt_analysis.chunker import Chunker
-from srdt_analysis.collections import AlbertCollectionHandler
 from srdt_analysis.constants import CHUNK_INDEX
-from srdt_analysis.data_exploiter_embed import make_batches
 from srdt_analysis.elastic_handler import ElasticIndicesHandler
+from srdt_analysis.embedding_store import content_hash, document_hash
 from srdt_analysis.models import Chunk, DocumentData
 
 uri = "https://www.legifrance.gouv.fr/codes/section_lc/LEGITEXT000006072050"
 
 articles_uri = "https://www.legifrance.gouv.fr/codes/article_lc"
 
-chunker = Chunker()
+# bytes of the LEGI file read at once by the streaming parser
+READ_SIZE = 1 << 16
 
-load_dotenv()
-albert = AlbertCollectionHandler()
 
-elastic = ElasticIndicesHandler()
+@functools.cache
+def get_chunker() -> Chunker:
+    return Chunker()
 
 
 def get_articles(node):
@@ -33,104 +33,238 @@ def get_articles(node):
     return articles
 
 
-def get_text_flat(node):
+def get_text_flat(node) -> list[str]:
+    # depth first with an explicit stack of children iterators
     content = []
-    for c in node["children"]:
+    stack = [iter(node["children"])]
+    while stack:
+        c = next(stack[-1], None)
+        if c is None:
+            stack.pop()
+            continue
+
         if "num" in c["data"]:
             content.append(f"\nArticle {c['data']['num']}")
 
         if "texte" in c["data"]:
             content.append(c["data"]["texte"])
         else:
-            content = content + get_text_flat(c)
+            stack.append(iter(c["children"]))
 
     return content
 
 
-def recursive_lookup(path, node) -> list[DocumentData]:
+def to_document_data(path: list[str], node) -> DocumentData:
     data = node["data"]
-
-    if "title" not in data:
-        return []
-
-    title = data["title"]
-
-    newPath = path + [title]
-
-    if len(node["children"]) < 1:
-        return []
-
-    # if any of its children is an article, we flatten them and select the node
-    elif next(c["type"] == "article" for c in node["children"]):
-        text = " \n ".join(get_text_flat(node))
-        articles = get_articles(node)
-        return [
-            {
-                "articles": articles,
-                # todo
-                "cdtn_id": data["cid"],
-                "initial_id": data["cid"],
-                "title": " ".join(newPath),
-                "content": text,
-                "content_chunked": chunker.split_character_recursive(text),
-                "url": f"{uri}/{data['cid']}",
-                "source": "code_du_travail",
-                "idcc": None,
-            }
-        ]
-
-    else:
-        docs = []
-        for c in node["children"]:
-            docs = docs + recursive_lookup(newPath, c)
-        return docs
+    text = " \n ".join(get_text_flat(node))
+    return {
+        "articles": get_articles(node),
+        # todo
+        "cdtn_id": data["cid"],
+        "initial_id": data["cid"],
+        "title": " ".join(path),
+        "content": text,
+        "content_chunked": get_chunker().split_character_recursive(text),
+        "url": f"{uri}/{data['cid']}",
+        "source": "code_du_travail",
+        "idcc": None,
+    }
+
+
+def walk_legi_tree(root, path: Optional[list[str]] = None) -> Iterator[DocumentData]:
+    """Yield the sections of the code in document order, a section being a
+    node whose first child is an article. `path` is the titles of the
+    ancestors of `root`.
+
+    The tree is walked with an explicit stack and consumed as it goes: once
+    a node is visited its children are detached, so the sections already
+    yielded can be garbage collected while the rest of the code is walked.
+    """
+    stack: list[tuple[list[str], Any]] = [(path or [], root)]
+    while stack:
+        path, node = stack.pop()
+        data = node["data"]
+
+        if "title" not in data or len(node["children"]) < 1:
+            continue
+
+        newPath = path + [data["title"]]
+
+        # if its first child is an article, we flatten them and select the node
+        if node["children"][0]["type"] == "article":
+            yield to_document_data(newPath, node)
+        else:
+            stack.extend((newPath, c) for c in reversed(node["children"]))
+
+        node["children"] = []
+
+
+_token = re.compile(
+    r"[ \t\n\r]*(?:([{}\[\]:,])|(\")|(-?[0-9][0-9.eE+-]*|true|false|null))"
+)
+
+_decoder = json.JSONDecoder()
+
+
+class _Frame:
+    """A container being parsed: a node of the tree, the children list of a
+    node, or any other object or array.
+    """
+
+    def __init__(self, value, kind: str):
+        self.value = value
+        self.kind = kind
+        self.key: Optional[str] = None
+        # whether the node is a section, known once its first child is parsed
+        self.section: Optional[bool] = None
+
+
+def _adopt(stack: list[_Frame], child) -> Iterator[DocumentData]:
+    # a node of a children list is parsed: it is kept in its parent when the
+    # parent is a section, or when the titles of the ancestors are not known
+    # yet (data after children), otherwise its sections are yielded now and
+    # it is dropped
+    # stack[-1] is the children list of the parent
+    parent = stack[-2]
+    if parent.section is None:
+        parent.section = child.get("type") == "article"
+    nodes = [frame.value for frame in stack if frame.kind == "node"]
+    if parent.section or any("data" not in node for node in nodes):
+        stack[-1].value.append(child)
+    elif all("title" in node["data"] for node in nodes):
+        yield from walk_legi_tree(child, [node["data"]["title"] for node in nodes])
+
+
+def parse_legi_tree(f: IO[str]) -> Iterator[DocumentData]:
+    """Parse the LEGI JSON file as it is read and yield its sections, see
+    walk_legi_tree. Only the section being parsed and the path to it are held
+    in memory, not the whole tree.
+    """
+    buffer = f.read(READ_SIZE)
+    eof = not buffer
+    pos = 0
+    stack: list[_Frame] = []
+
+    while True:
+        if not eof and len(buffer) - pos < READ_SIZE:
+            chunk = f.read(READ_SIZE)
+            eof = not chunk
+            buffer = buffer[pos:] + chunk
+            pos = 0
+
+        match = _token.match(buffer, pos)
+        if match is None and not eof:
+            chunk = f.read(READ_SIZE)
+            eof = not chunk
+            buffer += chunk
+            continue
+        if match is None:
+            if buffer[pos:].strip():
+                raise json.JSONDecodeError("Unexpected character", buffer, pos)
+            raise json.JSONDecodeError("Unexpected end of file", buffer, pos)
+        # a literal may be cut by the end of the buffer
+        if match.group(3) and match.end() == len(buffer) and not eof:
+            chunk = f.read(READ_SIZE)
+            eof = not chunk
+            buffer += chunk
+            continue
+
+        punctuation, quote, literal = match.groups()
+        pos = match.end()
+        if punctuation in (":", ","):
+            continue
+
+        if quote:
+            while True:
+                try:
+                    # decoded from its opening quote
+                    value, pos = _decoder.raw_decode(buffer, pos - 1)
+                    break
+                except json.JSONDecodeError:
+                    if eof:
+                        raise
+                    chunk = f.read(READ_SIZE)
+                    eof = not chunk
+                    buffer += chunk
+            if stack and isinstance(stack[-1].value, dict) and stack[-1].key is None:
+                stack[-1].key = value
+                continue
+        elif literal:
+            value = json.loads(literal)
+        elif punctuation in "{[":
+            parent = stack[-1] if stack else None
+            if punctuation == "[":
+                is_children = (
+                    parent is not None
+                    and parent.kind == "node"
+                    and parent.key == "children"
+                )
+                stack.append(_Frame([], "children" if is_children else "other"))
+            else:
+                is_node = parent is None or parent.kind == "children"
+                stack.append(_Frame({}, "node" if is_node else "other"))
+            continue
+        else:
+            frame = stack[-1]
+            if frame.kind == "node":
+                if len(stack) == 1:
+                    yield from walk_legi_tree(frame.value)
+                    return
+                stack.pop()
+                yield from _adopt(stack, frame.value)
+                continue
+            stack.pop()
+            value = frame.value
+            if not stack:
+                return
+
+        frame = stack[-1]
+        if isinstance(frame.value, dict):
+            frame.value[frame.key] = value
+            frame.key = None
+        else:
+            frame.value.append(value)
 
 
-def get_legi_data() -> list[DocumentData]:
+def get_legi_data() -> Iterator[DocumentData]:
     with open(str(os.getenv("LEGI_DATA_PATH"))) as f:
-        code = json.load(f)
-        return recursive_lookup([], code)
+        yield from parse_legi_tree(f)
 
 
-def get_legi_data_chunked() -> list[Chunk]:
-    docs = get_legi_data()
-
-    chunk_list: list[Chunk] = []
-
-    for doc in docs:
+def get_legi_chunks() -> Iterator[Chunk]:
+    for doc in get_legi_data():
+        doc_hash = document_hash(
+            doc["content"],
+            {
+                "title": doc["title"],
+                "url": doc["url"],
+                "idcc": doc["idcc"],
+                "source": doc["source"],
+                "articles": doc["articles"],
+            },
+            get_chunker().settings("character_recursive"),
+        )
         for idx, ds in enumerate(doc["content_chunked"]):
-            chunk_list.append(
-                {
-                    "content": ds.page_content,
+            yield {
+                "content": ds.page_content,
+                "id": doc["cdtn_id"],
+                "embedding": None,
+                "metadata": {
+                    "articles": doc["articles"],
+                    "idx": idx,
                     "id": doc["cdtn_id"],
-                    "embedding": None,
-                    "metadata": {
-                        "articles": doc["articles"],
-                        "idx": idx,
-                        "id": doc["cdtn_id"],
-                        "initial_id": doc["initial_id"],
-                        "url": doc["url"],
-                        "source": doc["source"],
-                        "title": doc["title"],
-                        "idcc": None,
-                    },
-                }
-            )
-
-    # run batches of 64 chunks to get embeddings
-    batches = make_batches(chunk_list, 64)
-
-    for docs in batches:
-        contents = [doc["content"] for doc in docs]
-        embeddings = albert.embeddings(contents)
-
-        for doc, emb in zip(docs, embeddings):
-            doc["embedding"] = emb  # type: ignore
-
-    return chunk_list
+                    "initial_id": doc["initial_id"],
+                    "url": doc["url"],
+                    "source": doc["source"],
+                    "title": doc["title"],
+                    "idcc": None,
+                    "document_hash": doc_hash,
+                    "chunk_hash": content_hash(ds.page_content),
+                },
+            }
 
 
-def get_article_url(num: str) -> Optional[str]:
+def get_article_url(elastic: ElasticIndicesHandler, num: str) -> Optional[str]:
     node = elastic.get_article_node(CHUNK_INDEX, num)
 
     if len(node) < 1 or node[0]["metadata"]["articles"] is None:
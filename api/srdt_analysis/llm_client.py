@@ -1,6 +1,10 @@
 import asyncio
+import hashlib
 import json
-from typing import AsyncIterator, NoReturn, Sequence, Union
+import time
+from contextlib import asynccontextmanager
+from timeit import default_timer as timer
+from typing import AsyncIterator, NoReturn, Optional, Sequence, Union
 
 import httpx
 from tenacity import (
@@ -10,12 +14,18 @@ from tenacity import (
     wait_exponential,
 )
 
-from srdt_analysis.constants import API_TIMEOUT
+from srdt_analysis.constants import (
+    API_TIMEOUT,
+    LLM_CLIENT_IDLE_TIMEOUT,
+    LLM_MAX_CONCURRENCY,
+    LLM_MAX_CONNECTIONS,
+)
 from srdt_analysis.exceptions import (
     ExternalServiceError,
     ServiceUnavailableError,
 )
 from srdt_analysis.logger import Logger
+from srdt_analysis.metrics import observe, timed
 from srdt_analysis.models import (
     LLMChatPayload,
     SystemLLMMessage,
@@ -23,12 +33,88 @@ from srdt_analysis.models import (
 )
 
 
+class LLMUpstream:
+    """Pooled httpx client and concurrency limit of one LLM provider, shared
+    by every request targeting it with the same key.
+    """
+
+    def __init__(self):
+        self.client = httpx.AsyncClient(
+            timeout=API_TIMEOUT,
+            limits=httpx.Limits(
+                max_connections=LLM_MAX_CONNECTIONS,
+                max_keepalive_connections=LLM_MAX_CONNECTIONS,
+            ),
+        )
+        self.rate_limit = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+        self.active = 0
+        self.last_used = time.monotonic()
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[httpx.AsyncClient]:
+        self.active += 1
+        try:
+            async with self.rate_limit:
+                yield self.client
+        finally:
+            self.active -= 1
+            self.last_used = time.monotonic()
+
+    def is_idle(self, now: float, idle_timeout: float) -> bool:
+        return self.active == 0 and now - self.last_used > idle_timeout
+
+    async def close(self):
+        await self.client.aclose()
+
+
+class LLMClientPool:
+    """Registry of LLMUpstream keyed on (base_url, api key hash), idle
+    upstreams are evicted and closed when the pool is accessed.
+    """
+
+    def __init__(self, idle_timeout: float = LLM_CLIENT_IDLE_TIMEOUT):
+        self.logger = Logger("LLMClientPool")
+        self.idle_timeout = idle_timeout
+        self._upstreams: dict[tuple[str, str], LLMUpstream] = {}
+        self._closing: set[asyncio.Task] = set()
+
+    def get(self, base_url: str, api_key: str, model: str) -> "LLMClient":
+        self._evict_idle()
+        key = (base_url, hashlib.sha256(api_key.encode("utf-8")).hexdigest())
+        upstream = self._upstreams.get(key)
+        if upstream is None:
+            upstream = LLMUpstream()
+            self._upstreams[key] = upstream
+        upstream.last_used = time.monotonic()
+        return LLMClient(base_url, api_key, model, upstream=upstream)
+
+    def _evict_idle(self):
+        now = time.monotonic()
+        for key, upstream in list(self._upstreams.items()):
+            if upstream.is_idle(now, self.idle_timeout):
+                self.logger.debug(f"Closing idle LLM client for {key[0]}")
+                del self._upstreams[key]
+                task = asyncio.create_task(upstream.close())
+                self._closing.add(task)
+                task.add_done_callback(self._closing.discard)
+
+    async def close(self):
+        upstreams = list(self._upstreams.values())
+        self._upstreams.clear()
+        await asyncio.gather(
+            *[upstream.close() for upstream in upstreams],
+            *self._closing,
+            return_exceptions=True,
+        )
+
+
 class LLMClient:
-    def __init__(self, base_url, api_key, model):
+    def __init__(
+        self, base_url, api_key, model, upstream: Optional[LLMUpstream] = None
+    ):
         super().__init__()
         self.logger = Logger("LLMClient")
-        self.client = httpx.AsyncClient(timeout=API_TIMEOUT)
-        self.rate_limit = asyncio.Semaphore(10)
+        self.upstream = upstream if upstream is not None else LLMUpstream()
         self.base_url = base_url
         self.headers = {
             "Authorization": f"Bearer {api_key}",
@@ -70,7 +156,7 @@ class LLMClient:
         system_prompt: str,
         chat_history: list[UserLLMMessage],
     ) -> str:
-        async with self.rate_limit:
+        async with self.upstream.slot() as client:
             try:
                 messages: Sequence[Union[SystemLLMMessage, UserLLMMessage]] = [
                     SystemLLMMessage(role="system", content=system_prompt),
@@ -83,7 +169,7 @@ class LLMClient:
 
                 # self.logger.debug(payload)
 
-                response = await self.client.post(
+                response = await client.post(
                     f"{self.base_url}/v1/chat/completions",
                     headers=self.headers,
                     json=payload,
@@ -108,7 +194,7 @@ class LLMClient:
         system_prompt: str,
         chat_history: list[UserLLMMessage],
     ) -> AsyncIterator[str]:
-        async with self.rate_limit:
+        async with self.upstream.slot() as client:
             try:
                 messages: Sequence[Union[SystemLLMMessage, UserLLMMessage]] = [
                     SystemLLMMessage(role="system", content=system_prompt),
@@ -120,7 +206,7 @@ class LLMClient:
                     "stream": True,
                 }
 
-                async with self.client.stream(
+                async with client.stream(
                     "POST",
                     f"{self.base_url}/v1/chat/completions",
                     headers=self.headers,
@@ -165,7 +251,8 @@ class LLMClient:
         chat_history: list[UserLLMMessage],
     ) -> str:
         self.logger.info("Generating a chat completions answer")
-        return await self._make_chat_completions_async(system_prompt, chat_history)
+        with timed("llm_generation"):
+            return await self._make_chat_completions_async(system_prompt, chat_history)
 
     async def generate_completions_stream_async(
         self,
@@ -173,7 +260,13 @@ class LLMClient:
         chat_history: list[UserLLMMessage],
     ) -> AsyncIterator[str]:
         self.logger.info("Generating a streaming chat completions answer")
+        start = timer()
+        first = True
         async for chunk in self._make_chat_completions_stream_async(
             system_prompt, chat_history
         ):
+            if first:
+                observe("llm_ttft", timer() - start)
+                first = False
             yield chunk
+        observe("llm_generation", timer() - start)
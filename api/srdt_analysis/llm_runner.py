@@ -1,26 +1,32 @@
 from typing import AsyncIterator, Optional, Tuple
 
-from srdt_analysis.collections import AlbertCollectionHandler
 from srdt_analysis.constants import (
     LLM_ANSWER_PROMPT,
     LLM_REPHRASING_PROMPT,
     LLM_SPLIT_MULTIPLE_QUERIES_PROMPT,
 )
-from srdt_analysis.llm_client import LLMClient
+from srdt_analysis.llm_client import LLMClient, LLMClientPool
 from srdt_analysis.models import (
     UserLLMMessage,
 )
 
 
 class LLMRunner:
-    collections: AlbertCollectionHandler
     # llm_processor: MistralClient
     llm_processor: LLMClient
 
-    def __init__(self, llm_url: str, llm_api_token: str, llm_model: str):
-        self.collections = AlbertCollectionHandler()
+    def __init__(
+        self,
+        llm_url: str,
+        llm_api_token: str,
+        llm_model: str,
+        llm_pool: Optional[LLMClientPool] = None,
+    ):
         # self.llm_processor = MistralClient(llm_url, llm_api_token, llm_model)
-        self.llm_processor = LLMClient(llm_url, llm_api_token, llm_model)
+        if llm_pool is not None:
+            self.llm_processor = llm_pool.get(llm_url, llm_api_token, llm_model)
+        else:
+            self.llm_processor = LLMClient(llm_url, llm_api_token, llm_model)
 
     async def rephrase_and_split(
         self,
@@ -0,0 +1,238 @@
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from timeit import default_timer as timer
+from typing import Iterator, Optional
+
+from srdt_analysis.constants import METRICS_BUCKETS
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class Histogram:
+    """Minimal Prometheus histogram, rendered in the text exposition format."""
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: tuple[str, ...],
+        buckets: tuple[float, ...] = METRICS_BUCKETS,
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        # label values -> (count per bucket, sum, count)
+        self._series: dict[tuple[str, ...], tuple[list[int], float, int]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        with self._lock:
+            counts, total, count = self._series.get(
+                key, ([0] * len(self.buckets), 0.0, 0)
+            )
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            self._series[key] = (counts, total + value, count + 1)
+
+    def render(self) -> list[str]:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} histogram",
+        ]
+        with self._lock:
+            series = sorted(self._series.items())
+        for key, (counts, total, count) in series:
+            labels = ",".join(
+                f'{name}="{_escape(value)}"'
+                for name, value in zip(self.labelnames, key)
+            )
+            sep = "," if labels else ""
+            for bound, bucket_count in zip(self.buckets, counts):
+                lines.append(
+                    f'{self.name}_bucket{{{labels}{sep}le="{bound}"}} {bucket_count}'
+                )
+            lines.append(f'{self.name}_bucket{{{labels}{sep}le="+Inf"}} {count}')
+            lines.append(f"{self.name}_sum{{{labels}}} {total}")
+            lines.append(f"{self.name}_count{{{labels}}} {count}")
+        return lines
+
+
+class Counter:
+    """Minimal Prometheus counter, rendered in the text exposition format."""
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...]):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._lock = threading.Lock()
+        self._series: dict[tuple[str, ...], float] = defaultdict(float)
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        with self._lock:
+            self._series[key] += amount
+
+    def render(self) -> list[str]:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} counter",
+        ]
+        with self._lock:
+            series = sorted(self._series.items())
+        for key, value in series:
+            labels = ",".join(
+                f'{name}="{_escape(value)}"'
+                for name, value in zip(self.labelnames, key)
+            )
+            lines.append(f"{self.name}{{{labels}}} {value}")
+        return lines
+
+
+class Gauge(Counter):
+    """Minimal Prometheus gauge, rendered in the text exposition format."""
+
+    def set(self, value: float, **labels: str) -> None:
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        with self._lock:
+            self._series[key] = value
+
+    def render(self) -> list[str]:
+        lines = super().render()
+        lines[1] = f"# TYPE {self.name} gauge"
+        return lines
+
+
+STAGE_DURATION = Histogram(
+    "srdt_stage_duration_seconds",
+    "Duration of a processing stage",
+    ("stage", "endpoint", "collection"),
+)
+REQUEST_DURATION = Histogram(
+    "srdt_request_duration_seconds",
+    "Duration of an API request, streaming included",
+    ("endpoint", "method", "status"),
+)
+
+CACHE_REQUESTS = Counter(
+    "srdt_cache_requests_total",
+    "Lookups of a result cache: hit, miss or coalesced with a pending miss",
+    ("cache", "result"),
+)
+
+CACHE_ENTRIES = Gauge(
+    "srdt_cache_entries",
+    "Entries held by a result cache",
+    ("cache",),
+)
+
+
+def render_metrics() -> str:
+    lines = (
+        STAGE_DURATION.render()
+        + REQUEST_DURATION.render()
+        + CACHE_REQUESTS.render()
+        + CACHE_ENTRIES.render()
+    )
+    return "\n".join(lines) + "\n"
+
+
+class RequestTimings:
+    """Stage durations of the current request, they are labelled with its
+    endpoint once the request is routed and done.
+    """
+
+    def __init__(self):
+        self.samples: list[tuple[str, str, float]] = []
+
+    def server_timing(self) -> str:
+        durations: dict[str, float] = defaultdict(float)
+        for stage, _, duration in self.samples:
+            durations[stage] += duration
+        return ", ".join(
+            f"{stage};dur={duration * 1000:.1f}"
+            for stage, duration in durations.items()
+        )
+
+
+_request_timings: ContextVar[Optional[RequestTimings]] = ContextVar(
+    "request_timings", default=None
+)
+
+
+def observe(stage: str, duration: float, collection: str = "") -> None:
+    timings = _request_timings.get()
+    if timings is None:
+        STAGE_DURATION.observe(duration, stage=stage, collection=collection)
+    else:
+        timings.samples.append((stage, collection, duration))
+
+
+@contextmanager
+def timed(stage: str, collection: str = "") -> Iterator[None]:
+    start = timer()
+    try:
+        yield
+    finally:
+        observe(stage, timer() - start, collection)
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording the stage timings of each request, the
+    streamed body included, and optionally sending them in a Server-Timing
+    header (only the stages done before the response starts).
+    """
+
+    def __init__(self, app, server_timing: bool = False):
+        self.app = app
+        self.server_timing = server_timing
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings = RequestTimings()
+        token = _request_timings.set(timings)
+        start = timer()
+        status = 500
+
+        async def send_with_timings(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                header = timings.server_timing()
+                if self.server_timing and header:
+                    message = {
+                        **message,
+                        "headers": [
+                            *message.get("headers", []),
+                            (b"server-timing", header.encode("latin-1")),
+                        ],
+                    }
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timings)
+        finally:
+            _request_timings.reset(token)
+            # the route template, so that path parameters do not explode the
+            # number of series
+            route = scope.get("route")
+            endpoint = getattr(route, "path", "unmatched")
+            for stage, collection, duration in timings.samples:
+                STAGE_DURATION.observe(
+                    duration, stage=stage, endpoint=endpoint, collection=collection
+                )
+            REQUEST_DURATION.observe(
+                timer() - start,
+                endpoint=endpoint,
+                method=scope["method"],
+                status=str(status),
+            )
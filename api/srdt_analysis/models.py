@@ -163,6 +163,8 @@ class ChunkMetadata(TypedDict):
     idx: int
     initial_id: Optional[str]
     articles: Optional[list[JSONDict]]
+    document_hash: Optional[str]
+    chunk_hash: Optional[str]
 
 
 @dataclass
@@ -173,6 +175,16 @@ class Chunk(TypedDict):
     embedding: Optional[list[float]]
 
 
+@dataclass
+class IndexedChunk:
+    """Hashes of a chunk already in the index, used by incremental ingestion."""
+
+    document_id: str
+    source: CollectionName
+    document_hash: Optional[str]
+    chunk_hash: Optional[str]
+
+
 @dataclass
 class RankedChunk(TypedDict):
     score: float
@@ -1,7 +1,8 @@
 import asyncio
 import os
 from contextlib import asynccontextmanager
-from typing import Optional, Sequence
+from datetime import datetime
+from typing import Any, AsyncIterator, Optional, Sequence
 
 import asyncpg
 
@@ -33,29 +34,76 @@ class PostgreSQLManager:
         async with self.pool.acquire() as conn:
             yield conn
 
-    async def fetch_documents_by_source(self, source: CollectionName) -> DocumentsList:
-        async with self.get_connection() as conn:
-            query = """
-                SELECT * from public.documents
-                WHERE source = $1
-                AND is_published = true
-                AND is_available = true
-            """
-            if source == "contributions":
-                query += " AND document->>'content' IS NOT NULL AND document->>'idcc' = '0000'"
-            if source == "contributions_idcc":
-                query += " AND document->>'content' IS NOT NULL AND document->>'idcc' != '0000'"
-
-            result = await conn.fetch(
-                query, "contributions" if source == "contributions_idcc" else source
+    def _documents_query(
+        self,
+        source: CollectionName,
+        columns: str = "*",
+        updated_since: Optional[datetime] = None,
+    ) -> tuple[str, list[Any]]:
+        query = f"""
+            SELECT {columns} from public.documents
+            WHERE source = $1
+            AND is_published = true
+            AND is_available = true
+        """
+        if source == "contributions":
+            query += (
+                " AND document->>'content' IS NOT NULL AND document->>'idcc' = '0000'"
+            )
+        if source == "contributions_idcc":
+            query += (
+                " AND document->>'content' IS NOT NULL AND document->>'idcc' != '0000'"
             )
-            results = [Document.from_record(r) for r in result]
 
-            if source == "contributions_idcc":
-                for r in results:
-                    r.source = source
+        params: list[Any] = [
+            "contributions" if source == "contributions_idcc" else source
+        ]
+        if updated_since is not None:
+            query += " AND updated_at > $2::timestamptz"
+            params.append(updated_since)
+
+        return query, params
 
-            return results
+    def _to_document(self, record: asyncpg.Record, source: CollectionName) -> Document:
+        document = Document.from_record(record)
+        if source == "contributions_idcc":
+            document.source = source
+        return document
+
+    async def fetch_documents_by_source(
+        self, source: CollectionName, updated_since: Optional[datetime] = None
+    ) -> DocumentsList:
+        async with self.get_connection() as conn:
+            query, params = self._documents_query(source, updated_since=updated_since)
+            result = await conn.fetch(query, *params)
+            return [self._to_document(r, source) for r in result]
+
+    async def fetch_document_ids_by_source(self, source: CollectionName) -> set[str]:
+        async with self.get_connection() as conn:
+            query, params = self._documents_query(source, columns="cdtn_id")
+            result = await conn.fetch(query, *params)
+            return {r["cdtn_id"] for r in result}
+
+    async def iter_documents_by_source(
+        self,
+        source: CollectionName,
+        batch_size: int,
+        updated_since: Optional[datetime] = None,
+    ) -> AsyncIterator[DocumentsList]:
+        """Yield the documents of a source by batches, through a server-side
+        cursor, so that the whole source is never held in memory.
+        """
+        async with self.get_connection() as conn:
+            query, params = self._documents_query(source, updated_since=updated_since)
+            batch: DocumentsList = []
+            async with conn.transaction():
+                async for record in conn.cursor(query, *params, prefetch=batch_size):
+                    batch.append(self._to_document(record, source))
+                    if len(batch) >= batch_size:
+                        yield batch
+                        batch = []
+            if batch:
+                yield batch
 
     async def fetch_sources(
         self, sources: Sequence[CollectionName]
@@ -1,19 +1,8 @@
 import re
-from typing import Optional, TypedDict
-
-from nltk.tokenize import TreebankWordTokenizer
-
-_tokenizer = TreebankWordTokenizer()
+from typing import Optional, TypedDict, Union
 
 # FIXME: borrowed from fiche MT data package in JS, converted to Python by AI
 
-NEGATIVE = "O"
-ARTICLE = "B-ART"
-CODE_PREFIX = "B-COD"
-CODE_TRA = CODE_PREFIX + "_TRA"
-CODE_SS = CODE_PREFIX + "_SS"
-CODE_OTHER = CODE_PREFIX + "_O"
-
 UNRECOGNIZED = "unrecognized"
 
 CODE_TRAVAIL = {
@@ -26,11 +15,6 @@ CODE_SECU = {
     "name": "code de la sécurité sociale",
 }
 
-codes_full_names = {
-    CODE_SS: CODE_SECU,
-    CODE_TRA: CODE_TRAVAIL,
-}
-
 range_ = 20  # max distance between code tokens and corresponding article ref
 
 article_regex = re.compile(r"^(\d{1,4}(-\d+){0,3})\b")
@@ -62,122 +46,107 @@ def prefix_matcher(token: str) -> int:
     return 0
 
 
-def infix_matcher(token: str) -> bool:
-    return token in ["à", "\u00e0"]
-
-
-def classify_tokens(tokens: list[str]) -> list[str]:
-    # step 1: check for prefix matches or articles
-    step1 = []
-    for token in tokens:
-        prefix = prefix_matcher(token)
-        infix = infix_matcher(token)
-        article = article_matcher(token)
-
-        if prefix > 0:
-            step1.append(prefix)
-        elif article:
-            step1.append(3)
-        elif infix:
-            step1.append(4)
-        else:
-            step1.append(0)
-
-    # step 2: confirm valid sequences
-    predictions = [[]]  # last element is the buffer
-
-    for e in step1:
-        buffer = predictions[-1]
-        in_sequence = len(buffer) > 0
-        last_element = buffer[-1] if buffer else None
-
-        if e >= 1 and in_sequence:
-            buffer.append(e)
-        elif e == 0 and in_sequence and last_element and last_element > 1:
-            predictions.pop()
-            for _ in buffer:
-                predictions.append(True)  # type: ignore
-            predictions.append(False)  # type: ignore
-            predictions.append([])
-        elif e > 0 and e < 3 and not in_sequence:
-            buffer.append(e)
-        else:
-            predictions.pop()
-            for _ in buffer:
-                predictions.append(False)  # type: ignore
-            predictions.append(False)  # type: ignore
-            predictions.append([])
-
-    # conclude
-    residual = predictions.pop()
-    if len(residual) > 0 and residual[-1] > 1:
-        for _ in residual:
-            predictions.append(True)  # type: ignore
-    else:
-        for _ in residual:
-            predictions.append(False)  # type: ignore
-
-    return [ARTICLE if p else NEGATIVE for p in predictions]
-
-
-def identify_codes(tokens: list[str], predictions: list[str]) -> list[str]:
-    match_code = [
-        CODE_PREFIX if token.lower() == "code" else predictions[i]
-        for i, token in enumerate(tokens)
-    ]
-
-    resolved = []
-    for i, pred in enumerate(match_code):
-        if pred == CODE_PREFIX:
-            joined = " ".join(tokens[i : i + 5]).lower()
-            if joined.startswith(codes_full_names[CODE_SS]["name"]):
-                resolved.append(CODE_SS)
-            elif joined.startswith(codes_full_names[CODE_TRA]["name"]):
-                resolved.append(CODE_TRA)
-            else:
-                resolved.append(CODE_OTHER)
-        else:
-            resolved.append(pred)
-
-    return resolved
-
-
 class Reference(TypedDict):
     code: Optional[dict]
     text: str
 
 
+# token boundaries of nltk's TreebankWordTokenizer, which the extractor was
+# first written against: whitespace, the punctuation split off as tokens of
+# their own, and the English clitics split off a word when they end it
+_punctuation = r"[;@#$%&?!\[\](){}<>\"]|(?<![,:])[,:](?!\d)|\.\.\.|--|''|``"
+# the period ending the text, before closing brackets and quotes
+_final_period = r"(?<!\.)\.(?=[\]\)}>\"']*\s*\Z)"
+_clitic_end = rf"(?= |\Z|{_punctuation}|\.[\]\)}}>\"']*\s*\Z)"
+_clitic = (
+    rf"(?<!')(?:'[sSmMdD]?{_clitic_end}"
+    rf"|(?:'ll|'LL|'re|'RE|'ve|'VE|n't|N'T)(?=(?:'[sSmMdD]?)?{_clitic_end}))"
+)
+_split = rf"{_punctuation}|{_final_period}|{_clitic}"
+# a character of a word, the ones that cannot start a split are matched first
+_word_char = rf"(?:[^\s;@#$%&?!\[\](){{}}<>\"',:.`\-nN]|n(?!'t)|N(?!'T)|(?!{_split})\S)"
+_any_token = rf"{_split}|{_word_char}+"
+# the rest of a token
+_word_rest = rf"{_word_char}*"
+_token_end = rf"(?=\s|\Z|{_split})"
+_article = rf"\d{{1,4}}(?:-\d+){{0,3}}(?:\b|{_token_end})"
+
+# a single pass over the text, token by token: the tokens that matter are
+# prefixes (1: alone, 2: followed by an article number), article numbers (3),
+# the "à" infix (4) and "code", matched whole, any other token is negative
+# and matched by the last, unnamed, alternative
+_lexer = re.compile(
+    rf"(?:"
+    rf"(?P<prefix>(?i:[lrd])(?:(?!{_split})\.)?)"
+    rf"|(?P<prefix_article>(?i:[lrd]){_word_char}{_article}{_word_rest})"
+    rf"|(?P<article>{_article}{_word_rest})"
+    rf"|(?P<infix>à)"
+    rf"|(?P<code>(?i:code))"
+    rf"){_token_end}"
+    rf"|{_any_token}"
+)
+_token_values = {"prefix": 1, "prefix_article": 2, "article": 3, "infix": 4}
+
+_token = re.compile(_any_token)
+
+# looked for in this order, as the name of a code may start another one
+_codes = [CODE_SECU, CODE_TRAVAIL]
+
+
+def _code_at(text: str, start: int) -> Union[dict, str]:
+    # the code named by the tokens from `start`, joined by spaces
+    tokens = []
+    for token in _token.finditer(text, start):
+        tokens.append(token[0])
+        if len(tokens) == 5:
+            break
+    joined = " ".join(tokens).lower()
+    for code in _codes:
+        if joined.startswith(code["name"]):
+            return code
+    return UNRECOGNIZED
+
+
 def extract_references(text: str) -> list[Reference]:
-    tokens = treebank_tokenize(text)
-    predictions = classify_tokens(tokens)
-    predictions = identify_codes(tokens, predictions)
-
-    acc = []
-    for index, (token, pred) in enumerate(zip(tokens, predictions)):
-        if pred == ARTICLE:
-            if not acc:
-                acc.append({"index": index, "token": token})
-            else:
-                last = acc[-1]
-                if last["index"] + 1 == index:
-                    last["token"] = f"{last['token']} {token}"
-                    last["index"] = index
-                else:
-                    acc.append({"index": index, "token": token})
-        elif pred.startswith(CODE_PREFIX) and acc:
+    """Article references of `text` (e.g. "L. 1234-1"), with the code they
+    belong to if it is named in the range_ tokens after them.
+
+    A reference is a sequence of tokens starting with a prefix and ending
+    with an article number, the text is lexed in a single pass.
+    """
+    acc: list[dict] = []
+
+    # current sequence: its tokens, and the index and value of its last token
+    tokens: list[str] = []
+    last = 0
+    value = 0
+    for index, lexeme in enumerate(_lexer.finditer(text)):
+        kind = lexeme.lastgroup
+        if kind in _token_values:
+            if tokens or _token_values[kind] < 3:
+                tokens.append(lexeme[0])
+                last = index
+                value = _token_values[kind]
+            continue
+
+        # any other token ends the sequence, which is a reference when it
+        # ends with a number
+        if tokens:
+            if value > 1:
+                acc.append({"index": last, "token": " ".join(tokens)})
+            tokens = []
+
+        if kind == "code":
+            code = _code_at(text, lexeme.start())
             for match in acc:
                 if not match.get("code") and match["index"] + range_ >= index:
-                    if pred in codes_full_names:
-                        match["code"] = codes_full_names[pred]
-                    else:
-                        match["code"] = UNRECOGNIZED
+                    match["code"] = code
+
+    if tokens and value > 1:
+        acc.append({"index": last, "token": " ".join(tokens)})
 
     return [
         {"code": m.get("code"), "text": m["token"]}
         for m in acc
         if not m.get("code") or m.get("code") != UNRECOGNIZED
     ]
-
-
-def treebank_tokenize(text: str) -> list[str]:
-    return _tokenizer.tokenize(text)
@@ -0,0 +1,68 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Generic, Hashable, Optional, TypeVar
+
+from srdt_analysis.metrics import CACHE_REQUESTS
+
+T = TypeVar("T")
+
+
+class ResultCache(Generic[T]):
+    """Bounded in-process cache of API results, with LRU eviction and a TTL.
+
+    Concurrent misses of the same key share a single computation, which
+    completes even if the request that started it is cancelled. Lookups are
+    counted in the srdt_cache_requests_total metric, labelled with `name`.
+    """
+
+    def __init__(self, name: str, max_size: int, ttl: float):
+        self.name = name
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: OrderedDict[Hashable, tuple[float, T]] = OrderedDict()
+        self._pending: dict[Hashable, asyncio.Future[T]] = {}
+
+    def get(self, key: Hashable) -> Optional[T]:
+        entry = self._entries.get(key)
+        if entry is not None and time.monotonic() - entry[0] <= self.ttl:
+            self._entries.move_to_end(key)
+            CACHE_REQUESTS.inc(cache=self.name, result="hit")
+            return entry[1]
+
+        if entry is not None:
+            del self._entries[key]
+        CACHE_REQUESTS.inc(cache=self.name, result="miss")
+        return None
+
+    def set(self, key: Hashable, value: T) -> None:
+        self._entries[key] = (time.monotonic(), value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    async def get_or_compute(
+        self, key: Hashable, compute: Callable[[], Awaitable[T]]
+    ) -> T:
+        pending = self._pending.get(key)
+        if pending is not None:
+            CACHE_REQUESTS.inc(cache=self.name, result="coalesced")
+            return await asyncio.shield(pending)
+
+        value = self.get(key)
+        if value is not None:
+            return value
+
+        task = asyncio.ensure_future(compute())
+        self._pending[key] = task
+        task.add_done_callback(lambda task: self._computed(key, task))
+        return await asyncio.shield(task)
+
+    def _computed(self, key: Hashable, task: asyncio.Future[T]) -> None:
+        del self._pending[key]
+        # errors are not cached, the next request computes again
+        if not task.cancelled() and task.exception() is None:
+            self.set(key, task.result())
+
+    def stats(self) -> dict[str, int]:
+        return {"size": len(self._entries), "pending": len(self._pending)}
@@ -0,0 +1,138 @@
+import argparse
+import asyncio
+import random
+import statistics
+from timeit import default_timer as timer
+from typing import cast
+
+from dotenv import load_dotenv
+
+from srdt_analysis.chunker import Chunker
+from srdt_analysis.constants import CHUNK_INDEX
+from srdt_analysis.elastic_handler import (
+    AsyncElasticIndicesHandler,
+    ElasticIndicesHandler,
+)
+from srdt_analysis.ingestion import EXPLOITERS
+from srdt_analysis.logger import Logger
+from srdt_analysis.models import CollectionName, DocumentsList
+from srdt_analysis.postgresql_manager import PostgreSQLManager
+from srdt_analysis.tokenizer import Tokenizer
+
+load_dotenv()
+
+logger = Logger("ChunkingBenchmark")
+
+# input length of the reranker, in tokens
+RERANKER_MAX_TOKENS = 512
+
+
+async def fetch_documents(source: CollectionName) -> DocumentsList:
+    db = PostgreSQLManager()
+    try:
+        return await db.fetch_documents_by_source(source)
+    finally:
+        await db.close()
+
+
+async def evaluate(
+    index_name: str,
+    docs: DocumentsList,
+    sources: list[str],
+    candidates: int,
+    k: int,
+) -> tuple[int, int, list[float]]:
+    # the title of a document is the query, its chunks the expected results
+    es = AsyncElasticIndicesHandler()
+    try:
+        retrieved = 0
+        reranked = 0
+        durations = []
+        for doc in docs:
+            results = await es.search(index_name, doc.title, candidates, True, sources)
+            ids = [result.metadata.id for result in results]
+            retrieved += doc.cdtn_id in ids
+
+            start = timer()
+            ranks = await es.albert.rerank(
+                doc.title, [result.content for result in results]
+            )
+            durations.append(timer() - start)
+            ranks = sorted(ranks, key=lambda r: r["relevance_score"], reverse=True)
+            reranked += doc.cdtn_id in [ids[r["index"]] for r in ranks[:k]]
+        return retrieved, reranked, durations
+    finally:
+        await es.close()
+
+
+def run(
+    index: ElasticIndicesHandler,
+    source: CollectionName,
+    docs: DocumentsList,
+    length_unit: str,
+    candidates: int,
+    k: int,
+):
+    exploiter_class, content_type = EXPLOITERS[source]
+    exploiter = exploiter_class()
+    exploiter.chunker = Chunker(length_unit)
+    chunks = exploiter.chunk_documents(docs, content_type)
+    exploiter.embed_chunks(chunks)
+
+    lengths = Tokenizer().compute_nb_tokens_many([chunk["content"] for chunk in chunks])
+    percentiles = statistics.quantiles(lengths, n=100)
+    truncated = sum(length > RERANKER_MAX_TOKENS for length in lengths)
+    logger.info(
+        f"{length_unit}: {len(chunks)} chunks, "
+        f"p50 {percentiles[49]:.0f} tokens, p95 {percentiles[94]:.0f} tokens, "
+        f"{truncated / len(chunks):.1%} above {RERANKER_MAX_TOKENS} tokens"
+    )
+
+    sources = list({chunk["metadata"]["source"] for chunk in chunks})
+    # embed_chunks set the embedding of every chunk
+    dims = len(cast(list[float], chunks[0]["embedding"]))
+    index_name = index.init_index_default(
+        f"{CHUNK_INDEX}-benchmark-{length_unit}", dims
+    )
+    try:
+        index.stream_items(index_name, chunks)
+        index.client.indices.refresh(index=index_name)
+        retrieved, reranked, durations = asyncio.run(
+            evaluate(index_name, docs, sources, candidates, k)
+        )
+    finally:
+        index.client.indices.delete(index=index_name)
+
+    percentiles = statistics.quantiles(durations, n=100)
+    logger.info(
+        f"{length_unit}: recall@{candidates} {retrieved / len(docs):.1%}, "
+        f"recall@{k} after rerank {reranked / len(docs):.1%}, "
+        f"rerank p50 {percentiles[49] * 1000:.0f}ms, "
+        f"p95 {percentiles[94] * 1000:.0f}ms"
+    )
+
+
+def start():
+    """Chunk a sample of documents on characters and on tokens, index both
+    into temporary indices, then compare the chunks length, the retrieval
+    recall of the documents from their title, before and after reranking,
+    and the rerank latency.
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--source", choices=list(EXPLOITERS), default="contributions")
+    parser.add_argument("--documents", type=int, default=200)
+    parser.add_argument("--candidates", type=int, default=20)
+    parser.add_argument("--k", type=int, default=5)
+    args = parser.parse_args()
+
+    docs = asyncio.run(fetch_documents(args.source))
+    docs = random.sample(docs, min(args.documents, len(docs)))  # nosec B311
+    logger.info(f"Sampled {len(docs)} documents from {args.source}")
+
+    index = ElasticIndicesHandler()
+    for length_unit in ("characters", "tokens"):
+        run(index, args.source, docs, length_unit, args.candidates, args.k)
+
+
+if __name__ == "__main__":
+    start()
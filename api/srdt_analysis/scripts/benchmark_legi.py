@@ -0,0 +1,35 @@
+import resource
+from timeit import default_timer as timer
+
+from dotenv import load_dotenv
+
+from srdt_analysis.legi_data import get_legi_data
+from srdt_analysis.logger import Logger
+
+load_dotenv()
+
+logger = Logger("LegiBenchmark")
+
+
+def start():
+    """Walk the Code du travail file at LEGI_DATA_PATH, as the ingestion does,
+    and report the elapsed time and the peak RSS of the process.
+    """
+    start = timer()
+    nb_documents = 0
+    nb_chunks = 0
+    for doc in get_legi_data():
+        nb_documents += 1
+        nb_chunks += len(doc["content_chunked"])
+    elapsed = timer() - start
+
+    # ru_maxrss is in kilobytes on Linux
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    logger.info(
+        f"{nb_documents} sections, {nb_chunks} chunks in {elapsed:.2f}s, "
+        f"peak RSS {peak_rss:.0f} MB"
+    )
+
+
+if __name__ == "__main__":
+    start()
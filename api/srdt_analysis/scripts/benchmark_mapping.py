@@ -0,0 +1,117 @@
+import argparse
+import random
+import statistics
+from timeit import default_timer as timer
+from typing import cast
+
+from dotenv import load_dotenv
+from elasticsearch import helpers
+
+from srdt_analysis.constants import CHUNK_INDEX, SOURCES
+from srdt_analysis.elastic_handler import (
+    ElasticIndicesHandler,
+    chunks_mappings,
+    french_analyzer,
+)
+from srdt_analysis.embedding_store import get_embedding_store
+from srdt_analysis.logger import Logger
+from srdt_analysis.models import Chunk
+
+load_dotenv()
+
+logger = Logger("MappingBenchmark")
+
+
+def sample_chunks(
+    index: ElasticIndicesHandler, index_name: str, size: int
+) -> list[Chunk]:
+    chunks: list[Chunk] = []
+    for hit in helpers.scan(
+        index.client,
+        index=index_name,
+        query={"query": {"match_all": {}}, "_source": ["id", "content", "metadata"]},
+    ):
+        chunks.append(hit["_source"])
+        if len(chunks) >= size:
+            break
+
+    # the embeddings are not in _source anymore, the store has them
+    embeddings = get_embedding_store().embeddings(
+        index.albert, [chunk["content"] for chunk in chunks]
+    )
+    for chunk, embedding in zip(chunks, embeddings):
+        chunk["embedding"] = embedding
+    return chunks
+
+
+def run_queries(index: ElasticIndicesHandler, index_name: str, queries) -> list[float]:
+    durations = []
+    for chunk, source in queries:
+        start = timer()
+        index.client.search(
+            **index._knn_search_params(index_name, chunk["embedding"], 64, [source])
+        )
+        index.client.search(
+            **index._text_search_params(
+                index_name, chunk["content"][:200], 64, [source]
+            )
+        )
+        durations.append(timer() - start)
+    return durations
+
+
+def start():
+    """Index the same sample of chunks with dynamic mapping (the previous
+    behaviour) and with the declared mapping, then compare the size of both
+    indices and the latency of filtered KNN and text searches.
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--index", default=CHUNK_INDEX)
+    parser.add_argument("--size", type=int, default=5000)
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    index = ElasticIndicesHandler()
+    chunks = sample_chunks(index, args.index, args.size)
+    # sample_chunks sets the embedding of every chunk
+    dims = len(cast(list[float], chunks[0]["embedding"]))
+    logger.info(f"Sampled {len(chunks)} chunks from {args.index}")
+
+    queries = [(chunk, random.choice(SOURCES)) for chunk in chunks]  # nosec B311
+    queries = random.sample(queries, min(args.queries, len(queries)))  # nosec B311
+
+    mappings = {
+        "dynamic": {
+            "properties": {"content": {"type": "text", "analyzer": "ascii_french"}}
+        },
+        "declared": chunks_mappings(dims),
+    }
+    for name, mapping in mappings.items():
+        index_name = index.init_index(
+            {
+                "name": f"{args.index}-benchmark-{name}",
+                "mappings": mapping,
+                "settings": {"analysis": french_analyzer},
+            }
+        )
+        try:
+            index.stream_items(index_name, [chunk.copy() for chunk in chunks])
+            index.client.indices.forcemerge(index=index_name, max_num_segments=1)
+            stats = index.client.indices.stats(index=index_name, metric="store")
+            size = stats["_all"]["primaries"]["store"]["size_in_bytes"]
+
+            # warm up, then measure
+            run_queries(index, index_name, queries[:10])
+            durations = run_queries(index, index_name, queries)
+            percentiles = statistics.quantiles(durations, n=100)
+            logger.info(
+                f"{name}: {size / 1024 / 1024:.1f} MB, "
+                f"p50 {percentiles[49] * 1000:.1f}ms, "
+                f"p95 {percentiles[94] * 1000:.1f}ms"
+            )
+        finally:
+            index.client.indices.delete(index=index_name)
+
+
+if __name__ == "__main__":
+    start()
@@ -0,0 +1,64 @@
+import argparse
+import statistics
+import subprocess  # nosec B404
+import sys
+import time
+from timeit import default_timer as timer
+
+from dotenv import load_dotenv
+
+from srdt_analysis.logger import Logger
+
+load_dotenv()
+
+logger = Logger("StartupBenchmark")
+
+
+def import_time(module: str, repeat: int) -> list[float]:
+    # a fresh interpreter each time, nothing is imported yet
+    durations = []
+    for _ in range(repeat):
+        start = timer()
+        subprocess.run([sys.executable, "-c", f"import {module}"], check=True)  # nosec B603
+        durations.append(timer() - start)
+    return durations
+
+
+def start():
+    """Time the import of the API module in fresh interpreters, then the
+    startup of the API until /healthz answers and until /healthz/ready does,
+    i.e. until every resource is loaded in the background.
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--timeout", type=float, default=120)
+    args = parser.parse_args()
+
+    durations = import_time("srdt_analysis.api.main", args.repeat)
+    logger.info(
+        f"import srdt_analysis.api.main: mean {statistics.mean(durations):.2f}s, "
+        f"min {min(durations):.2f}s"
+    )
+
+    from fastapi.testclient import TestClient
+
+    from srdt_analysis.api.main import app
+    from srdt_analysis.constants import BASE_API_URL
+
+    start = timer()
+    with TestClient(app) as client:
+        client.get(f"{BASE_API_URL}/healthz").raise_for_status()
+        live = timer() - start
+        response = client.get(f"{BASE_API_URL}/healthz/ready")
+        while response.status_code != 200 and timer() - start < args.timeout:
+            time.sleep(0.1)
+            response = client.get(f"{BASE_API_URL}/healthz/ready")
+        ready = timer() - start
+        logger.info(
+            f"live after {live:.2f}s, ready after {ready:.2f}s: "
+            f"{response.json()['resources']}"
+        )
+
+
+if __name__ == "__main__":
+    start()
@@ -0,0 +1,61 @@
+import argparse
+import asyncio
+import json
+import statistics
+from timeit import default_timer as timer
+
+from dotenv import load_dotenv
+
+from srdt_analysis.elastic_handler import AsyncElasticIndicesHandler
+from srdt_analysis.index_lookups import ArticleUrls, CdtnUrls
+from srdt_analysis.logger import Logger
+from srdt_analysis.url_cleaner import clean_urls
+
+load_dotenv()
+
+logger = Logger("UrlCleanerBenchmark")
+
+
+async def run(answers: list[str], repeat: int):
+    es = AsyncElasticIndicesHandler()
+    try:
+        # the lookups are loaded once, as in the API
+        article_urls = ArticleUrls(es)
+        cdtn_urls = CdtnUrls(es)
+        await asyncio.gather(article_urls.data(), cdtn_urls.data())
+
+        durations = []
+        for _ in range(repeat):
+            for answer in answers:
+                start = timer()
+                await clean_urls(article_urls, cdtn_urls, answer)
+                durations.append(timer() - start)
+    finally:
+        await es.close()
+
+    percentiles = statistics.quantiles(durations, n=100)
+    size = sum(len(answer) for answer in answers) / len(answers)
+    logger.info(
+        f"{len(answers)} answers of {size:.0f} characters on average, "
+        f"mean {statistics.mean(durations) * 1000:.2f}ms, "
+        f"p50 {percentiles[49] * 1000:.2f}ms, p95 {percentiles[94] * 1000:.2f}ms"
+    )
+
+
+def start():
+    """Time clean_urls over real answers, a JSONL file with one {"text": ...}
+    object per line (e.g. the `text` of /generate responses).
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument("answers")
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    with open(args.answers) as f:
+        answers = [json.loads(line)["text"] for line in f if line.strip()]
+
+    asyncio.run(run(answers, args.repeat))
+
+
+if __name__ == "__main__":
+    start()
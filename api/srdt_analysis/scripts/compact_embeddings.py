@@ -0,0 +1,37 @@
+from dotenv import load_dotenv
+
+from srdt_analysis.collections import AlbertCollectionHandler
+from srdt_analysis.constants import CHUNK_INDEX
+from srdt_analysis.elastic_handler import ElasticIndicesHandler
+from srdt_analysis.embedding_store import get_embedding_store
+from srdt_analysis.logger import Logger
+
+load_dotenv()
+
+logger = Logger("EmbeddingsCompacter")
+
+
+def start():
+    index = ElasticIndicesHandler()
+    albert = AlbertCollectionHandler()
+    store = get_embedding_store()
+
+    # the chunks of the live index are the only ones an ingestion can reuse
+    referenced = {
+        chunk.chunk_hash
+        for chunk in index.get_indexed_chunks(CHUNK_INDEX).values()
+        if chunk.chunk_hash is not None
+    }
+    logger.info(f"{len(referenced)} chunk embeddings referenced by {CHUNK_INDEX}")
+
+    if referenced:
+        evicted = store.compact(albert.model, referenced)
+        logger.info(f"Evicted {evicted} embeddings")
+    else:
+        logger.warning(f"No chunk hash in {CHUNK_INDEX}, nothing evicted")
+
+    store.close()
+
+
+if __name__ == "__main__":
+    start()
@@ -1,81 +1,62 @@
+import argparse
+
 from dotenv import load_dotenv
 
 from srdt_analysis import legi_data
 from srdt_analysis.constants import CHUNK_INDEX
-from srdt_analysis.data_exploiter_embed import (
-    FichesMTExploiter,
-    FichesSPExploiter,
-    PageInfosExploiter,
-    PagesContributionsExploiter,
-)
 from srdt_analysis.elastic_handler import ElasticIndicesHandler
-from srdt_analysis.legi_data import get_legi_data_chunked
+from srdt_analysis.ingestion import IngestionPipeline
+from srdt_analysis.legi_data import get_legi_chunks
 from srdt_analysis.logger import Logger
-from srdt_analysis.postgresql_manager import get_data
+from srdt_analysis.models import CollectionName
 
 load_dotenv()
 
 logger = Logger("Ingester")
 
 
-def start():
-    logger.info("Read data from Postgres")
-    data = get_data(
-        [
-            "information",
-            "page_fiche_ministere_travail",
-            "fiches_service_public",
-            "contributions",
-            "contributions_idcc",
-        ]
-    )
-
-    page_contribs_exploiter = PagesContributionsExploiter()
-    page_contribs = page_contribs_exploiter.process_documents(
-        data["contributions"], "html"
-    )
-
-    page_contribs_idcc_exploiter = PagesContributionsExploiter()
-    page_contribs_idcc = page_contribs_idcc_exploiter.process_documents(
-        data["contributions_idcc"], "html_contribs"
-    )
-
-    page_infos_exploiter = PageInfosExploiter()
-    page_infos = page_infos_exploiter.process_documents(data["information"], "markdown")
+SOURCES: list[CollectionName] = [
+    "contributions",
+    "contributions_idcc",
+    "information",
+    "page_fiche_ministere_travail",
+    "fiches_service_public",
+]
 
-    fiche_mt_exploiter = FichesMTExploiter()
-    fiche_mt = fiche_mt_exploiter.process_documents(
-        data["page_fiche_ministere_travail"], "html"
-    )
 
-    page_sp_exploiter = FichesSPExploiter()
-    page_sp = page_sp_exploiter.process_documents(
-        data["fiches_service_public"], "character_recursive"
+def start():
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="only re-ingest the documents changed since the last run, in the "
+        "live index, instead of rebuilding it",
     )
-
-    articles_code_du_travail = get_legi_data_chunked()
-
-    logger.info("Reingest corpus")
+    args = parser.parse_args()
 
     index = ElasticIndicesHandler()
 
     index_name = CHUNK_INDEX
 
-    alias = index.init_index_default(index_name)
+    # documents are streamed from Postgres, chunked, embedded and indexed
+    # concurrently, the Code du travail articles come last
+    pipeline = IngestionPipeline(index)
+
+    if args.incremental and index.client.indices.exists_alias(name=index_name):
+        logger.info("Incremental ingestion of the corpus")
+        indexed = pipeline.run(index_name, SOURCES, get_legi_chunks(), incremental=True)
+        logger.info(f"Indexed {indexed} chunks")
+    else:
+        logger.info("Reingest corpus")
+
+        alias = index.init_index_default(index_name)
 
-    for docs in [
-        page_contribs,
-        page_contribs_idcc,
-        page_infos,
-        fiche_mt,
-        page_sp,
-        articles_code_du_travail,
-    ]:
-        index.add_items(alias, docs)
+        indexed = pipeline.run(alias, SOURCES, get_legi_chunks())
+        logger.info(f"Indexed {indexed} chunks")
 
-    index.swap_aliases(index_name, alias)
+        index.swap_aliases(index_name, alias)
 
-    legi_data.get_article_url("L351-6")
+    legi_data.get_article_url(index, "L351-6")
 
 
 if __name__ == "__main__":
@@ -1,23 +1,124 @@
+import asyncio
+import hashlib
 import os
+import threading
+from collections import OrderedDict
+from typing import Optional
 
 import tiktoken
 
+from srdt_analysis.constants import (
+    TOKENIZER_CACHE_SIZE,
+    TOKENIZER_OFFLOAD_MIN_CHARS,
+    TOKENIZER_THREADS,
+)
+from srdt_analysis.metrics import timed
+
 
 class Tokenizer:
-    def __init__(self):
+    """Token counting, meant to be shared by the whole process. Counts are
+    kept in a small LRU keyed on the hash of the text, so that the messages
+    of a conversation are only tokenized once across its turns.
+    """
+
+    def __init__(self, cache_size: int = TOKENIZER_CACHE_SIZE):
         model = os.getenv("TIKTOKEN_TOKENIZER_MODEL")
         if model is None:
             raise ValueError("TIKTOKEN_TOKENIZER_MODEL environment variable is not set")
-        self._tokenizer = tiktoken.get_encoding(model)
+        self.model = model
+        self.cache_size = cache_size
+        self._encoding: Optional[tiktoken.Encoding] = None
+        self._counts: OrderedDict[bytes, int] = OrderedDict()
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._encoding is not None
+
+    def load(self) -> tiktoken.Encoding:
+        # the encoding takes about a second to load, it is loaded on first use
+        if self._encoding is None:
+            with self._load_lock:
+                if self._encoding is None:
+                    self._encoding = tiktoken.get_encoding(self.model)
+        return self._encoding
+
+    def _key(self, text: str) -> bytes:
+        return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+    def _cached(self, key: bytes) -> Optional[int]:
+        with self._lock:
+            count = self._counts.get(key)
+            if count is not None:
+                self._counts.move_to_end(key)
+            return count
+
+    def _store(self, key: bytes, count: int) -> None:
+        with self._lock:
+            self._counts[key] = count
+            self._counts.move_to_end(key)
+            while len(self._counts) > self.cache_size:
+                self._counts.popitem(last=False)
 
     def compute_nb_tokens(self, text: str) -> int:
-        tokens = self._tokenizer.encode(text)
-        return len(tokens)
+        return self.compute_nb_tokens_many([text])[0]
+
+    def _lookup(
+        self, texts: list[str]
+    ) -> tuple[list[bytes], list[Optional[int]], dict[bytes, str]]:
+        # keys and cached counts of the texts, and the texts not in cache
+        keys = [self._key(text) for text in texts]
+        counts = [self._cached(key) for key in keys]
+        missing = {
+            key: text for key, text, count in zip(keys, texts, counts) if count is None
+        }
+        return keys, counts, missing
+
+    def _encode(self, missing: dict[bytes, str]) -> dict[bytes, int]:
+        if not missing:
+            return {}
+        with timed("tokenisation"):
+            if len(missing) == 1:
+                encoded = [self.load().encode(*missing.values())]
+            else:
+                encoded = self.load().encode_batch(
+                    list(missing.values()), num_threads=TOKENIZER_THREADS
+                )
+        computed = {key: len(tokens) for key, tokens in zip(missing, encoded)}
+        for key, count in computed.items():
+            self._store(key, count)
+        return computed
+
+    def compute_nb_tokens_many(self, texts: list[str]) -> list[int]:
+        """Number of tokens of each text, the texts not in cache are encoded
+        together on TOKENIZER_THREADS threads.
+        """
+        keys, counts, missing = self._lookup(texts)
+        computed = self._encode(missing)
+        return [
+            computed[key] if count is None else count
+            for key, count in zip(keys, counts)
+        ]
+
+    async def compute_nb_tokens_many_async(self, texts: list[str]) -> list[int]:
+        """compute_nb_tokens_many for the event loop: when the texts not in
+        cache are long, they are encoded in a thread instead of blocking it.
+        """
+        keys, counts, missing = self._lookup(texts)
+        if sum(len(text) for text in missing.values()) >= TOKENIZER_OFFLOAD_MIN_CHARS:
+            computed = await asyncio.to_thread(self._encode, missing)
+        else:
+            computed = self._encode(missing)
+        return [
+            computed[key] if count is None else count
+            for key, count in zip(keys, counts)
+        ]
 
     def take_n(self, text: str, n: int) -> str:
-        tokens = self._tokenizer.encode(text)
+        tokens = self.load().encode(text)
 
         if len(tokens) > n:
-            return self._tokenizer.decode(tokens[:n])
+            return self.load().decode(tokens[:n])
         else:
             return text
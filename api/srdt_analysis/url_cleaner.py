@@ -1,40 +1,48 @@
 import regex
 
-from srdt_analysis.constants import CHUNK_INDEX
-from srdt_analysis.elastic_handler import ElasticIndicesHandler
-from srdt_analysis.reference_extractor import CODE_TRAVAIL, extract_references
-
-whitelist = [
-    "legifrance.gouv.fr",
-    "travail-emploi.gouv.fr",
-    "defenseurdesdroits.fr",
-    "francetravail.fr",
-    "antidiscriminations.fr",
-    "defenseurdesdroits.fr",
-    "service-public.fr",
-    "dreets.gouv.fr",
-    "cnil.fr",
-    "ags-garantie-salaires.org",
-    "ameli.fr",
-    "info-retraite.fr",
-    "travail-emploi.gouv.fr",
-    "travail-emploi.gouv.fr/inspection-du-travail",
-    "msa.fr",
-    "transitionspro.fr",
-    "travail-emploi.gouv.fr",
-    "moncompteformation.gouv.fr",
-    "mon-cep.org",
-    "agefiph.fr",
-    "service-public.fr",
-    "info-retraite.fr",
-    "avft.org",
-    "net-entreprises.fr",
-    "francetravail.fr",
-]
+from srdt_analysis.constants import STREAM_CLEAN_MAX_BUFFER
+from srdt_analysis.index_lookups import ArticleUrls, CdtnUrls
+from srdt_analysis.metrics import timed
+from srdt_analysis.reference_extractor import (
+    CODE_TRAVAIL,
+    extract_references,
+    prefix_matcher,
+    range_,
+)
+
+# domains whose links are kept, with their subdomains and pages
+whitelist = frozenset(
+    [
+        "travail-emploi.gouv.fr",
+        "defenseurdesdroits.fr",
+        "francetravail.fr",
+        "antidiscriminations.fr",
+        "service-public.fr",
+        "dreets.gouv.fr",
+        "cnil.fr",
+        "ags-garantie-salaires.org",
+        "ameli.fr",
+        "info-retraite.fr",
+        "msa.fr",
+        "transitionspro.fr",
+        "moncompteformation.gouv.fr",
+        "mon-cep.org",
+        "agefiph.fr",
+        "avft.org",
+        "net-entreprises.fr",
+    ]
+)
+
+# links to legifrance pages are often hallucinated, only its home is kept and
+# article references are linked from our index instead
+legifrance = "legifrance.gouv.fr"
 
 cdtn_url = "https://code.travail.gouv.fr/"
 
-es = ElasticIndicesHandler()
+link_pattern = regex.compile(r"\[([^][]+)\](\(((?:[^()]+|(?2))+)\))")
+
+# descriptions of links that are removed with them
+link_only_descriptions = {"source", "lien", "ici"}
 
 
 def to_comparable_path(url: str):
@@ -45,91 +53,178 @@ def to_comparable_path(url: str):
     return replaced
 
 
-def clean_urls(response: str):
-    """Remove broken urls contained in llm response, it
-    might be hallucinations, wrong domains or bad format.
-    """
-    pattern = regex.compile(r"\[([^][]+)\](\(((?:[^()]+|(?2))+)\))")
+def is_whitelisted(path: str) -> bool:
+    if path == legifrance:
+        return True
+    labels = path.replace("http://", "").split("/", 1)[0].lower().split(".")
+    return any(".".join(labels[i:]) in whitelist for i in range(len(labels) - 1))
 
-    cdtn = []
-    cdtn_error = []
-    legifrance = []
-    unknown = []
-    out_ok = []
 
-    def remove_from_response(resp: str, url: str, description: str):
-        # case where link looks like ([Source](https://.....))
-        if (
-            description.lower()
-            in [
-                "source",
-                "lien",
-                "ici",
-            ]
-            or description.startswith("www")
-            or description.startswith("http")
-        ):
-            return resp.replace(f"[{description}]({url})", "").replace("()", "")
-        # case where we want to keep the description in the text
-        else:
-            return resp.replace(f"[{description}]({url})", description)
+def link_replacement(description: str) -> str:
+    # case where link looks like ([Source](https://.....))
+    if (
+        description.lower() in link_only_descriptions
+        or description.startswith("www")
+        or description.startswith("http")
+    ):
+        return ""
+    # case where we want to keep the description in the text
+    return description
 
-    for match in pattern.finditer(response):
-        description, _, url = match.groups()
 
-        # print(f"{description}: {url}")
+async def clean_urls(article_urls: ArticleUrls, cdtn_urls: CdtnUrls, response: str):
+    """Remove broken urls contained in llm response, it
+    might be hallucinations, wrong domains or bad format.
+    Then link the references to articles of the Code du travail.
+    """
+    links = list(link_pattern.finditer(response))
+
+    # every cdtn link is checked at once
+    valid = await cdtn_urls.valid(
+        [
+            match.group(3)
+            for match in links
+            if to_comparable_path(match.group(3)).startswith("code.travail.gouv.fr")
+        ]
+    )
+
+    # the answer is rebuilt once from the spans kept and the replacements
+    parts = []
+    last = 0
+    for match in links:
+        description, _, url = match.groups()
         path = to_comparable_path(url)
+
         if path.startswith("code.travail.gouv.fr"):
-            check = es.check_urls(CHUNK_INDEX, [url])
-            if (
+            keep = (
                 # allow route site
-                url != cdtn_url
+                url == cdtn_url
                 # allow valid url in our index
-                and not check[0][1]
+                or valid[url]
                 # allow main CC pages
-                and not url.startswith(cdtn_url + "convention-collective")
-            ):
-                cdtn_error.append(url)
-                response = remove_from_response(response, url, description)
-            else:
-                cdtn.append(url)
-
-        elif path in whitelist:
-            out_ok.append(url)
-
-        # we remove link if legifrance or unknown
+                or url.startswith(cdtn_url + "convention-collective")
+            )
         else:
-            if "legifrance.gouv.fr" in url:
-                legifrance.append(url)
-            else:
-                unknown.append(url)
+            keep = is_whitelisted(path)
+        if keep:
+            continue
 
-            response = remove_from_response(response, url, description)
+        start, end = match.span()
+        replacement = link_replacement(description)
+        if (
+            not replacement
+            and start > last
+            and response[start - 1] == "("
+            and response[end : end + 1] == ")"
+        ):
+            # drop the parentheses left around the removed link
+            start, end = start - 1, end + 1
+        parts.append(response[last:start])
+        parts.append(replacement)
+        last = end
+    parts.append(response[last:])
+    response = "".join(parts)
 
     # extract article references in plain text
-    references = extract_references(response)
-
-    replaced = []
-
-    for ref in filter(
-        lambda r: r["code"] is None or r["code"] == CODE_TRAVAIL, references
-    ):
+    urls: dict[str, str] = {}
+    for ref in extract_references(response):
         text = ref["text"]
+        if (ref["code"] is not None and ref["code"] != CODE_TRAVAIL) or text in urls:
+            continue
         # reformat text, as references are stored in the simplest form, and we look for an exact match
-        f_text = text.replace(".", "").replace(" ", "")
+        url = await article_urls.get(text.replace(".", "").replace(" ", ""))
+        if url is not None:
+            urls[text] = url
 
-        # look for the reference in our index (stored as nodes)
-        nodes = es.get_article_node(CHUNK_INDEX, f_text)
+    if not urls:
+        return response
 
-        if len(nodes) > 0:
-            # look for the actual reference in the node
-            found = next(
-                (n for n in nodes[0]["metadata"]["articles"] if n["num"] == f_text),
-                None,
-            )
-            if found is not None and text not in replaced:
-                # replace the reference with an actual link
-                response = response.replace(text, f"[{text}]({found['url']})")
-                replaced.append(text)
+    # replace every reference with an actual link, longest first so that a
+    # reference is never linked inside another one
+    references = regex.compile(
+        "|".join(regex.escape(text) for text in sorted(urls, key=len, reverse=True))
+    )
+    return references.sub(lambda m: f"[{m[0]}]({urls[m[0]]})", response)
+
+
+# end of a sentence, the word before the dot excludes article prefixes ("L.")
+_sentence_end = regex.compile(r"\w{3,}[.!?]\s+")
 
-    return response
+_word = regex.compile(r"\w\S*")
+
+
+def _outside_links(text: str, cut: int, partial: bool) -> int:
+    # a link is cleaned whole, with the parentheses around it. A partial match
+    # is a link that the next deltas may complete
+    for match in link_pattern.finditer(text, partial=partial):
+        start = match.start()
+        if start > 0 and text[start - 1] == "(":
+            start -= 1
+        if start < cut <= match.end():
+            return start
+    return cut
+
+
+def _release_point(text: str) -> int:
+    """Length of the start of a streamed `text` that can be cleaned now,
+    before the first link, article reference or word that may be incomplete.
+    """
+    cut = len(text)
+    words = list(_word.finditer(text))
+    if words and words[-1].end() == len(text):
+        # the last word may go on in the next delta
+        cut = words[-1].start()
+    # the code of a reference is looked for in the range_ tokens after it,
+    # there are at least as many tokens as words
+    for word in words[-2 * range_ :]:
+        if prefix_matcher(word[0]):
+            cut = min(cut, word.start())
+            break
+    return _outside_links(text, cut, partial=True)
+
+
+class StreamingUrlCleaner:
+    """Clean an answer while it is streamed. The text is cleaned and released
+    as soon as it is complete, only its end is held back: an unfinished link,
+    an article reference until the code it belongs to is known, or the last
+    word.
+    """
+
+    def __init__(
+        self,
+        article_urls: ArticleUrls,
+        cdtn_urls: CdtnUrls,
+        max_buffer: int = STREAM_CLEAN_MAX_BUFFER,
+    ):
+        self.article_urls = article_urls
+        self.cdtn_urls = cdtn_urls
+        self.max_buffer = max_buffer
+        # cleaned text released so far
+        self.text = ""
+        self._buffer = ""
+
+    async def feed(self, delta: str) -> str:
+        """Add a delta of the answer, return the cleaned text it completes."""
+        self._buffer += delta
+        cut = _release_point(self._buffer)
+        if cut == 0 and len(self._buffer) > self.max_buffer:
+            # a bracket that was never closed, release the text up to its last
+            # complete sentence outside of a link
+            ends = list(_sentence_end.finditer(self._buffer))
+            if ends:
+                cut = _outside_links(self._buffer, ends[-1].end(), partial=False)
+        if cut == 0:
+            return ""
+        segment, self._buffer = self._buffer[:cut], self._buffer[cut:]
+        return await self._release(segment)
+
+    async def flush(self) -> str:
+        """Clean and return the rest of the answer, once it is complete."""
+        segment, self._buffer = self._buffer, ""
+        return await self._release(segment) if segment else ""
+
+    async def _release(self, segment: str) -> str:
+        with timed("clean_urls"):
+            cleaned = await clean_urls(self.article_urls, self.cdtn_urls, segment)
+        self.text += cleaned
+        return cleaned
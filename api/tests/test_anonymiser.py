@@ -0,0 +1,60 @@
+import asyncio
+
+import pytest
+
+from srdt_analysis import anonymiser
+from srdt_analysis.exceptions import SRDTException
+
+
+@pytest.fixture(autouse=True)
+def no_spacy(monkeypatch):
+    monkeypatch.setattr(anonymiser, "get_nlp", lambda: pytest.fail("spaCy loaded"))
+
+
+def fake_anonymise_batch(questions: list[str]) -> list[str]:
+    if "invalide" in questions:
+        raise SRDTException(message="Anonymize validation error")
+    return [question.replace("Jean", "PERSONNE") for question in questions]
+
+
+def test_batch_failure_only_fails_the_failing_question(monkeypatch):
+    monkeypatch.setattr(anonymiser, "anonymise_batch", fake_anonymise_batch)
+
+    async def run():
+        async_anonymiser = anonymiser.AsyncAnonymiser()
+        try:
+            return await asyncio.gather(
+                async_anonymiser.anonymise("Bonjour Jean"),
+                async_anonymiser.anonymise("invalide"),
+                async_anonymiser.anonymise("Jean est cadre"),
+                return_exceptions=True,
+            )
+        finally:
+            await async_anonymiser.close()
+
+    first, failed, last = asyncio.run(run())
+    assert first == "Bonjour PERSONNE"
+    assert isinstance(failed, SRDTException)
+    assert last == "PERSONNE est cadre"
+
+
+def test_questions_are_batched(monkeypatch):
+    batches = []
+
+    def record(questions: list[str]) -> list[str]:
+        batches.append(questions)
+        return questions
+
+    monkeypatch.setattr(anonymiser, "anonymise_batch", record)
+
+    async def run():
+        async_anonymiser = anonymiser.AsyncAnonymiser()
+        try:
+            return await asyncio.gather(
+                *(async_anonymiser.anonymise(str(i)) for i in range(3))
+            )
+        finally:
+            await async_anonymiser.close()
+
+    assert asyncio.run(run()) == ["0", "1", "2"]
+    assert batches == [["0", "1", "2"]]
@@ -0,0 +1,102 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from srdt_analysis import collections
+from srdt_analysis.collections import AsyncAlbertCollectionHandler
+from srdt_analysis.exceptions import ExternalServiceError
+
+
+@pytest.fixture(autouse=True)
+def albert_env(monkeypatch):
+    monkeypatch.setenv("ALBERT_API_KEY", "key")
+    monkeypatch.setenv("ALBERT_ENDPOINT", "http://albert")
+    monkeypatch.setenv("ALBERT_VECTORISATION_MODEL", "model")
+
+
+def embeddings_response(request: httpx.Request) -> httpx.Response:
+    inputs = json.loads(request.content)["input"]
+    return httpx.Response(
+        200, json={"data": [{"embedding": [float(len(text))]} for text in inputs]}
+    )
+
+
+def run_embeddings(handler, calls: list[list[str]]):
+    async def run():
+        try:
+            return await asyncio.gather(
+                *(handler.embeddings(chunks) for chunks in calls),
+                return_exceptions=True,
+            )
+        finally:
+            await handler.close()
+
+    return asyncio.run(run())
+
+
+def handler_with(respond, requests: list[list[str]]) -> AsyncAlbertCollectionHandler:
+    def record(request: httpx.Request) -> httpx.Response:
+        requests.append(json.loads(request.content)["input"])
+        return respond(request)
+
+    client = httpx.AsyncClient(
+        base_url="http://albert", transport=httpx.MockTransport(record)
+    )
+    return AsyncAlbertCollectionHandler(client=client)
+
+
+def test_concurrent_embeddings_are_merged_and_split_back():
+    requests = []
+    handler = handler_with(embeddings_response, requests)
+
+    results = run_embeddings(handler, [["a"], ["bb", "ccc"], ["dddd"]])
+
+    assert requests == [["a", "bb", "ccc", "dddd"]]
+    assert results == [[[1.0]], [[2.0], [3.0]], [[4.0]]]
+
+
+def test_full_batches_are_sent_without_waiting(monkeypatch):
+    monkeypatch.setattr(collections, "ALBERT_EMBEDDING_BATCH_SIZE", 3)
+    monkeypatch.setattr(collections, "ALBERT_EMBEDDING_BATCH_WINDOW", 60)
+    requests = []
+    handler = handler_with(embeddings_response, requests)
+
+    async def run():
+        try:
+            # the window would hold a partial batch for a minute
+            return await asyncio.wait_for(
+                asyncio.gather(
+                    handler.embeddings(["a", "bb"]), handler.embeddings(["ccc"])
+                ),
+                timeout=5,
+            )
+        finally:
+            await handler.close()
+
+    assert asyncio.run(run()) == [[[1.0], [2.0]], [[3.0]]]
+    assert requests == [["a", "bb", "ccc"]]
+
+
+def test_batch_error_is_raised_to_every_caller():
+    requests = []
+    handler = handler_with(lambda request: httpx.Response(500), requests)
+
+    results = run_embeddings(handler, [["a"], ["bb", "ccc"]])
+
+    # one retry of the merged call
+    assert requests == [["a", "bb", "ccc"]] * 2
+    assert all(isinstance(result, ExternalServiceError) for result in results)
+
+
+def test_missing_embeddings_fail_the_batch():
+    requests = []
+    handler = handler_with(
+        lambda request: httpx.Response(200, json={"data": [{"embedding": [0.0]}]}),
+        requests,
+    )
+
+    results = run_embeddings(handler, [["a"], ["bb"]])
+
+    assert all(isinstance(result, ExternalServiceError) for result in results)
@@ -0,0 +1,118 @@
+import pytest
+from elastic_transport import ApiResponseMeta, HttpHeaders, NodeConfig
+from elasticsearch import ApiError
+
+from srdt_analysis.api.schemas import ChunkMetadata, ChunkResult
+from srdt_analysis.constants import KNN_MAX_NUM_CANDIDATES, KNN_NUM_CANDIDATES_FACTOR
+from srdt_analysis.elastic_handler import (
+    BaseElasticIndicesHandler,
+    reciprocal_rank_fusion,
+)
+
+
+@pytest.fixture
+def handler(monkeypatch):
+    monkeypatch.setenv("ELASTIC_API_KEY", "key")
+    monkeypatch.setenv("ELASTIC_HOSTNAME", "http://localhost:9200")
+    return BaseElasticIndicesHandler()
+
+
+def test_filters_without_idcc(handler):
+    assert handler._filters(["code_du_travail"], None) == [
+        {"terms": {"metadata.source": ["code_du_travail"]}}
+    ]
+
+
+def test_filters_keep_generic_contributions(handler):
+    filters = handler._filters(["contributions"], "1234")
+    should = filters[1]["bool"]["should"]
+    assert {"term": {"metadata.idcc": "1234"}} in should
+    assert {"term": {"metadata.idcc": "0000"}} in should
+    assert {"bool": {"must_not": {"exists": {"field": "metadata.idcc"}}}} in should
+    assert filters[1]["bool"]["minimum_should_match"] == 1
+
+
+def test_knn_num_candidates(handler):
+    knn = handler._knn([0.0], 5, [], None)
+    assert knn["num_candidates"] == 5 * KNN_NUM_CANDIDATES_FACTOR
+    assert handler._knn([0.0], 5, [], 2)["num_candidates"] == 5
+    assert (
+        handler._knn([0.0], 5, [], KNN_MAX_NUM_CANDIDATES + 1)["num_candidates"]
+        == KNN_MAX_NUM_CANDIDATES
+    )
+
+
+def bad_request(status: int, error_type: str, reason: str) -> ApiError:
+    meta = ApiResponseMeta(
+        status=status,
+        http_version="1.1",
+        headers=HttpHeaders(),
+        duration=0.0,
+        node=NodeConfig("http", "localhost", 9200),
+    )
+    body = {"error": {"root_cause": [{"type": error_type, "reason": reason}]}}
+    return ApiError(error_type, meta, body)
+
+
+@pytest.mark.parametrize(
+    "status,error_type,reason",
+    [
+        (400, "parsing_exception", "unknown retriever [rrf]"),
+        (400, "parsing_exception", "Unknown key for a START_OBJECT in [retriever]."),
+        (
+            403,
+            "security_exception",
+            "current license is non-compliant for [Reciprocal Rank Fusion (RRF)]",
+        ),
+    ],
+)
+def test_hybrid_unsupported_falls_back(handler, status, error_type, reason):
+    assert handler._hybrid_unsupported(bad_request(status, error_type, reason))
+    assert not handler.native_hybrid
+
+
+@pytest.mark.parametrize(
+    "status,error_type,reason",
+    [
+        (400, "illegal_argument_exception", "[num_candidates] cannot exceed [10000]"),
+        (400, "x_content_parse_exception", "[1:42] failed to parse field [query]"),
+        (
+            403,
+            "security_exception",
+            "action [indices:data/read/search] is unauthorized",
+        ),
+        (500, "search_phase_execution_exception", "unknown retriever [rrf]"),
+    ],
+)
+def test_other_errors_keep_native_hybrid(handler, status, error_type, reason):
+    assert not handler._hybrid_unsupported(bad_request(status, error_type, reason))
+    assert handler.native_hybrid
+
+
+def chunk(id: str, score: float = 1.0) -> ChunkResult:
+    return ChunkResult(
+        score=score,
+        content=id,
+        id_chunk=id,
+        metadata=ChunkMetadata(title=id, url="", id=id, source="code_du_travail"),
+    )
+
+
+def test_reciprocal_rank_fusion_order_and_dedup():
+    first = [chunk("a"), chunk("b"), chunk("c")]
+    second = [chunk("b"), chunk("d"), chunk("a")]
+
+    fused = reciprocal_rank_fusion([first, second], k=10, rrf_k=60)
+
+    # "a" and "b" are found by both prompts, each chunk is returned once
+    assert [c.id_chunk for c in fused] == ["b", "a", "d", "c"]
+    assert fused[0].score == pytest.approx(1 / 62 + 1 / 61)
+    assert fused[1].score == pytest.approx(1 / 61 + 1 / 63)
+    assert fused[2].score == pytest.approx(1 / 62)
+    # the input lists keep their own scores
+    assert first[0].score == 1.0
+
+
+def test_reciprocal_rank_fusion_keeps_the_top_k():
+    fused = reciprocal_rank_fusion([[chunk("a"), chunk("b"), chunk("c")]], k=2)
+    assert [c.id_chunk for c in fused] == ["a", "b"]
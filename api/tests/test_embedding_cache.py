@@ -0,0 +1,57 @@
+import asyncio
+
+import pytest
+
+from srdt_analysis import embedding_cache
+from srdt_analysis.embedding_cache import EmbeddingCache
+
+
+@pytest.fixture
+def now(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(embedding_cache.time, "time", lambda: now[0])
+    return now
+
+
+def test_entries_expire_after_the_ttl(now):
+    cache = EmbeddingCache(max_size=10, ttl=60)
+    cache.set("model", "Quel préavis ?", [0.5])
+
+    # keyed on the normalized text
+    assert asyncio.run(cache.get("model", "  Quel   préavis ? ")) == [0.5]
+    assert asyncio.run(cache.get("other", "Quel préavis ?")) is None
+
+    now[0] += 61
+    assert asyncio.run(cache.get("model", "Quel préavis ?")) is None
+    assert cache.stats() == {"hits": 1, "misses": 2, "size": 0}
+
+
+def test_least_recently_used_entries_are_evicted(now):
+    cache = EmbeddingCache(max_size=2, ttl=60)
+    cache.set("model", "a", [1.0])
+    cache.set("model", "b", [2.0])
+    assert asyncio.run(cache.get("model", "a")) == [1.0]
+    cache.set("model", "c", [3.0])
+
+    assert asyncio.run(cache.get("model", "b")) is None
+    assert asyncio.run(cache.get("model", "a")) == [1.0]
+    assert asyncio.run(cache.get("model", "c")) == [3.0]
+
+
+def test_shared_store_round_trip(tmp_path, now):
+    path = str(tmp_path / "embeddings.sqlite")
+    writer = EmbeddingCache(max_size=10, ttl=60, path=path)
+    writer.set("model", "Quel préavis ?", [0.5, -0.25])
+    # pending writes are completed on close
+    writer.close()
+
+    reader = EmbeddingCache(max_size=10, ttl=60, path=path)
+    try:
+        assert asyncio.run(reader.get("model", "Quel préavis ?")) == [0.5, -0.25]
+        assert reader.stats()["size"] == 1
+        assert asyncio.run(reader.get("model", "Autre question")) is None
+
+        now[0] += 61
+        assert asyncio.run(reader.get("model", "Quel préavis ?")) is None
+    finally:
+        reader.close()
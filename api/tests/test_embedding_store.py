@@ -0,0 +1,75 @@
+import pytest
+
+from srdt_analysis.embedding_store import EmbeddingStore, content_hash
+
+
+class FakeAlbert:
+    model = "model"
+
+    def __init__(self):
+        self.calls: list[list[str]] = []
+
+    def embeddings(self, chunks: list[str]) -> list[list[float]]:
+        self.calls.append(chunks)
+        return [[float(len(chunk)), 0.5] for chunk in chunks]
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = EmbeddingStore(str(tmp_path / "store" / "embeddings.sqlite"))
+    yield store
+    store.close()
+
+
+def test_round_trip(store):
+    store.put_many("model", {"a": [0.5, -0.25], "b": [1.0, 2.0]})
+
+    assert store.get_many("model", ["a", "b", "c"]) == {
+        "a": [0.5, -0.25],
+        "b": [1.0, 2.0],
+    }
+    assert store.get_many("other", ["a"]) == {}
+
+
+def test_round_trip_across_connections(tmp_path):
+    path = str(tmp_path / "embeddings.sqlite")
+    store = EmbeddingStore(path)
+    store.put_many("model", {"a": [0.5]})
+    store.close()
+
+    store = EmbeddingStore(path)
+    try:
+        assert store.get_many("model", ["a"]) == {"a": [0.5]}
+    finally:
+        store.close()
+
+
+def test_only_missing_embeddings_are_computed(store):
+    albert = FakeAlbert()
+    assert store.embeddings(albert, ["a", "bb"]) == [[1.0, 0.5], [2.0, 0.5]]
+
+    assert store.embeddings(albert, ["bb", "ccc", "a"]) == [
+        [2.0, 0.5],
+        [3.0, 0.5],
+        [1.0, 0.5],
+    ]
+    assert albert.calls == [["a", "bb"], ["ccc"]]
+
+
+def test_compact_keeps_the_referenced_embeddings(store):
+    store.put_many("model", {"a": [1.0], "b": [2.0]})
+    store.put_many("other", {"a": [1.0]})
+
+    assert store.compact("model", {"a"}) == 1
+    assert store.get_many("model", ["a", "b"]) == {"a": [1.0]}
+    assert store.get_many("other", ["a"]) == {"a": [1.0]}
+    with pytest.raises(ValueError):
+        store.compact("model", set())
+
+
+def test_content_hash_is_the_store_key(store):
+    albert = FakeAlbert()
+    store.embeddings(albert, ["a"])
+    assert store.get_many("model", [content_hash("a")]) == {
+        content_hash("a"): [1.0, 0.5]
+    }
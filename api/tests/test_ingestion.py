@@ -0,0 +1,92 @@
+from dataclasses import replace
+
+import pytest
+
+from srdt_analysis.ingestion import IngestionPipeline, chunk_documents
+from srdt_analysis.models import Document, IndexedChunk
+
+DOCUMENT = Document(
+    cdtn_id="abc123",
+    initial_id="abc123",
+    title="Préavis de démission",
+    meta_description="",
+    source="contributions_idcc",
+    slug="1486-preavis-de-demission",
+    text="",
+    document={
+        "content": "<p>Le préavis de démission est d'un mois pour les employés.</p>"
+    },
+    is_published=True,
+    is_searchable=True,
+    created_at="2025-01-01",  # type: ignore
+    updated_at="2025-01-01",  # type: ignore
+    is_available=True,
+    idcc="1486",
+)
+
+
+@pytest.fixture(autouse=True)
+def env(monkeypatch):
+    monkeypatch.setenv("ALBERT_API_KEY", "key")
+    monkeypatch.setenv("ALBERT_ENDPOINT", "http://localhost")
+    monkeypatch.setenv("ALBERT_VECTORISATION_MODEL", "model")
+    monkeypatch.setenv("CHUNK_LENGTH_UNIT", "characters")
+
+
+class FakeIndex:
+    def chunk_id(self, chunk):
+        return f"{chunk['id']}-{chunk['metadata']['idx']}"
+
+
+def indexed(chunks) -> dict[str, IndexedChunk]:
+    return {
+        FakeIndex().chunk_id(chunk): IndexedChunk(
+            document_id=chunk["id"],
+            source=chunk["metadata"]["source"],
+            document_hash=chunk["metadata"]["document_hash"],
+            chunk_hash=chunk["metadata"]["chunk_hash"],
+        )
+        for chunk in chunks
+    }
+
+
+def select(chunks, already_indexed) -> list:
+    pipeline = IngestionPipeline(
+        FakeIndex(),  # type: ignore
+        albert=object(),  # type: ignore
+        embedding_store=object(),  # type: ignore
+    )
+    pipeline._incremental = True
+    pipeline._indexed = already_indexed
+    return pipeline._select(chunks)
+
+
+def test_unchanged_document_is_skipped():
+    _, chunks = chunk_documents("contributions_idcc", [DOCUMENT])
+    hashes = {DOCUMENT.cdtn_id: chunks[0]["metadata"]["document_hash"]}
+
+    ids, rechunked = chunk_documents("contributions_idcc", [DOCUMENT], hashes)
+    assert ids == [] and rechunked == []
+
+
+@pytest.mark.parametrize(
+    "changes",
+    [
+        {"title": "Préavis en cas de démission"},
+        {"slug": "1486-preavis"},
+        {"idcc": "1516"},
+    ],
+)
+def test_metadata_only_update_is_upserted(changes):
+    _, chunks = chunk_documents("contributions_idcc", [DOCUMENT])
+    hashes = {DOCUMENT.cdtn_id: chunks[0]["metadata"]["document_hash"]}
+
+    updated = replace(DOCUMENT, **changes)
+    ids, rechunked = chunk_documents("contributions_idcc", [updated], hashes)
+    assert ids == [DOCUMENT.cdtn_id]
+    # same content, same chunk hashes, the chunks are upserted all the same
+    assert [c["metadata"]["chunk_hash"] for c in rechunked] == [
+        c["metadata"]["chunk_hash"] for c in chunks
+    ]
+    assert select(rechunked, indexed(chunks)) == rechunked
+    assert select(chunks, indexed(chunks)) == []
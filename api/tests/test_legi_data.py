@@ -0,0 +1,145 @@
+import io
+import json
+import random
+
+import pytest
+
+from srdt_analysis import legi_data
+from srdt_analysis.legi_data import parse_legi_tree, walk_legi_tree
+
+TEXTS = [
+    "Le salarié a droit à un congé.",
+    'Texte avec "guillemets", barre \\ oblique et\nretour à la ligne.',
+    "Unicode échappé : éè – \U0001f600 et tabulation\t.",
+    "",
+]
+NUMBERS = [0, -1, 42, 3.5, -0.25, 1e-7, 6.02e23, 123456789012]
+
+
+def article(rng: random.Random, i: int) -> dict:
+    return {
+        "type": "article",
+        "data": {
+            "id": f"LEGIARTI{i:012d}",
+            "num": f"L. {rng.randint(1000, 9999)}-{i}",
+            "texte": rng.choice(TEXTS),
+            "etat": rng.choice(["VIGUEUR", None, True, False]),
+            "version": rng.choice(NUMBERS),
+        },
+        "children": [],
+    }
+
+
+def section(rng: random.Random, depth: int, counter: list[int]) -> dict:
+    counter[0] += 1
+    i = counter[0]
+    data = {"cid": f"LEGISCTA{i:012d}", "title": f"Section {i} {rng.choice(TEXTS)}"}
+    if depth == 0 or rng.random() < 0.3:
+        children = [article(rng, j) for j in range(rng.randint(0, 3))]
+    else:
+        children = [section(rng, depth - 1, counter) for _ in range(rng.randint(0, 3))]
+    if rng.random() < 0.2:
+        # a section without a title is skipped with its descendants
+        del data["title"]
+    node = {"type": "section", "data": data, "children": children}
+    if rng.random() < 0.5:
+        # data after children
+        node = {"children": children, "type": "section", "data": data}
+    return node
+
+
+def comparable(docs) -> list[dict]:
+    return [
+        {
+            **doc,
+            "content_chunked": [split.page_content for split in doc["content_chunked"]],
+        }
+        for doc in docs
+    ]
+
+
+def check(tree: dict, read_size: int, monkeypatch):
+    text = json.dumps(tree, ensure_ascii=bool(read_size % 2), indent=read_size % 3)
+    expected = comparable(walk_legi_tree(json.loads(text)))
+    monkeypatch.setattr(legi_data, "READ_SIZE", read_size)
+    assert comparable(parse_legi_tree(io.StringIO(text))) == expected
+    return expected
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_random_trees_match_json_load(seed, monkeypatch):
+    rng = random.Random(seed)
+    tree = {
+        "type": "code",
+        "data": {"title": "Code du travail", "id": "LEGITEXT000006072050"},
+        "children": [section(rng, 4, [0]) for _ in range(3)],
+    }
+    for read_size in (1, 2, 3, 5, 7, 64, 1 << 16):
+        check(tree, read_size, monkeypatch)
+
+
+@pytest.mark.parametrize("read_size", range(1, 12))
+def test_values_split_across_reads(read_size, monkeypatch):
+    rng = random.Random(read_size)
+    node = section(rng, 0, [0])
+    node["data"]["title"] = "Titre"
+    node["children"] = [article(rng, i) for i in range(len(TEXTS))]
+    for child, text, number in zip(node["children"], TEXTS, NUMBERS):
+        child["data"]["texte"] = text
+        child["data"]["version"] = number
+    root = {"type": "code", "data": {"title": "Code"}, "children": [node]}
+    docs = check(root, read_size, monkeypatch)
+    assert len(docs) == 1
+
+
+def test_data_after_children(monkeypatch):
+    rng = random.Random(0)
+    inner = {
+        "children": [article(rng, 1)],
+        "data": {"cid": "LEGISCTA1", "title": "Chapitre"},
+        "type": "section",
+    }
+    outer = {
+        "children": [inner],
+        "type": "section",
+        "data": {"cid": "LEGISCTA0", "title": "Titre"},
+    }
+    root = {"children": [outer], "data": {"title": "Code"}, "type": "code"}
+    docs = check(root, 4, monkeypatch)
+    assert [doc["title"] for doc in docs] == ["Code Titre Chapitre"]
+
+
+def test_empty_children(monkeypatch):
+    root = {
+        "type": "code",
+        "data": {"title": "Code"},
+        "children": [
+            {"type": "section", "data": {"cid": "A", "title": "Vide"}, "children": []},
+        ],
+    }
+    assert check(root, 3, monkeypatch) == []
+
+
+def test_deep_nesting(monkeypatch):
+    rng = random.Random(0)
+    node = {
+        "type": "section",
+        "data": {"cid": "LEGISCTA", "title": "Feuille"},
+        "children": [article(rng, 0)],
+    }
+    for depth in range(300):
+        node = {
+            "type": "section",
+            "data": {"cid": f"LEGISCTA{depth}", "title": str(depth)},
+            "children": [node],
+        }
+    docs = check(node, 16, monkeypatch)
+    assert len(docs) == 1
+    assert docs[0]["title"].endswith("1 0 Feuille")
+
+
+def test_truncated_file(monkeypatch):
+    monkeypatch.setattr(legi_data, "READ_SIZE", 8)
+    text = json.dumps({"type": "code", "data": {"title": "Code"}, "children": []})
+    with pytest.raises(json.JSONDecodeError):
+        list(parse_legi_tree(io.StringIO(text[:-5])))
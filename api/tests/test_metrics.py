@@ -0,0 +1,18 @@
+from fastapi.testclient import TestClient
+
+from srdt_analysis.api.main import app
+
+
+def test_metrics_require_the_api_key(monkeypatch):
+    monkeypatch.setenv("AUTH_API_KEY", "secret")
+    client = TestClient(app)
+
+    assert client.get("/metrics").status_code in (401, 403)
+    assert (
+        client.get("/metrics", headers={"Authorization": "Bearer wrong"}).status_code
+        == 401
+    )
+
+    response = client.get("/metrics", headers={"Authorization": "Bearer secret"})
+    assert response.status_code == 200
+    assert "srdt_" in response.text
@@ -0,0 +1,48 @@
+import json
+from pathlib import Path
+
+import pytest
+
+from srdt_analysis.reference_extractor import _lexer, extract_references
+
+# references extracted from these texts by the nltk Treebank tokenizer and the
+# token classifier, before the lexer replaced them
+CASES = json.loads(
+    (Path(__file__).parent / "fixtures" / "references.json").read_text("utf-8")
+)
+
+
+@pytest.mark.parametrize("case", CASES, ids=[case["text"][:40] for case in CASES])
+def test_extract_references_golden(case):
+    assert extract_references(case["text"]) == case["references"]
+
+
+@pytest.mark.parametrize(
+    "text, tokens",
+    [
+        (
+            "l'article L. 1234-1, (R.1234-2) ; voir...",
+            [
+                "l'article",
+                "L.",
+                "1234-1",
+                ",",
+                "(",
+                "R.1234-2",
+                ")",
+                ";",
+                "voir",
+                "...",
+            ],
+        ),
+        (
+            "2,5 jours: L.1234,5 et D.",
+            ["2,5", "jours", ":", "L.1234,5", "et", "D", "."],
+        ),
+        ('"L. 1234" --  L....', ['"', "L.", "1234", '"', "--", "L", "...", "."]),
+        ("it's done, isn't it", ["it", "'s", "done", ",", "is", "n't", "it"]),
+    ],
+)
+def test_lexer_token_boundaries(text, tokens):
+    # the boundaries of the Treebank tokenizer the golden outputs come from
+    assert [lexeme[0] for lexeme in _lexer.finditer(text)] == tokens
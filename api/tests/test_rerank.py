@@ -0,0 +1,87 @@
+import asyncio
+
+from srdt_analysis.api.main import rerank
+from srdt_analysis.api.schemas import ChunkMetadata, ChunkResult, RerankRequest
+from srdt_analysis.result_cache import ResultCache
+
+
+class FakeAlbert:
+    """Scores the inputs by the number in their content."""
+
+    def __init__(self):
+        self.calls: list[list[str]] = []
+
+    async def rerank(self, prompt: str, inputs: list[str]) -> list[dict]:
+        self.calls.append(inputs)
+        scores = [float(input.split()[-1]) for input in inputs]
+        # Albert returns the results sorted by score
+        return sorted(
+            (
+                {"index": index, "relevance_score": score}
+                for index, score in enumerate(scores)
+            ),
+            key=lambda rr: rr["relevance_score"],
+            reverse=True,
+        )
+
+
+def chunk(content: str, id: str) -> ChunkResult:
+    return ChunkResult(
+        score=0,
+        content=content,
+        id_chunk=id,
+        metadata=ChunkMetadata(title=id, url="", id=id, source="code_du_travail"),
+    )
+
+
+def run_rerank(albert: FakeAlbert, cache: ResultCache[float], inputs):
+    return asyncio.run(
+        rerank(
+            RerankRequest(prompt="préavis", inputs=inputs),
+            albert=albert,  # type: ignore
+            rerank_cache=cache,
+        )
+    )
+
+
+def test_rerank_sends_duplicates_once_and_keeps_input_order_on_ties():
+    albert = FakeAlbert()
+    cache = ResultCache[float]("rerank", max_size=100, ttl=60)
+    inputs = [
+        chunk("chunk 1", "a"),
+        chunk("chunk 3", "b"),
+        chunk("chunk 1", "c"),
+        chunk("other 1", "d"),
+        chunk("chunk 2", "e"),
+    ]
+
+    response = run_rerank(albert, cache, inputs)
+
+    assert albert.calls == [["chunk 1", "chunk 3", "other 1", "chunk 2"]]
+    # scores are mapped back to every input, "a", "c" and "d" tie
+    assert [(r.chunk.id_chunk, r.rerank_score) for r in response.results] == [
+        ("b", 3),
+        ("e", 2),
+        ("a", 1),
+        ("c", 1),
+        ("d", 1),
+    ]
+
+
+def test_rerank_only_sends_the_pairs_not_cached():
+    albert = FakeAlbert()
+    cache = ResultCache[float]("rerank", max_size=100, ttl=60)
+    run_rerank(albert, cache, [chunk("chunk 1", "a"), chunk("chunk 2", "b")])
+
+    response = run_rerank(
+        albert,
+        cache,
+        [chunk("chunk 4", "c"), chunk("chunk 2", "b"), chunk("chunk 1", "a")],
+    )
+
+    assert albert.calls[1:] == [["chunk 4"]]
+    assert [(r.chunk.id_chunk, r.rerank_score) for r in response.results] == [
+        ("c", 4),
+        ("b", 2),
+        ("a", 1),
+    ]
@@ -0,0 +1,96 @@
+import asyncio
+
+import pytest
+
+from srdt_analysis import result_cache
+from srdt_analysis.result_cache import ResultCache
+
+
+def test_concurrent_misses_share_one_computation():
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "value"
+
+    async def run():
+        cache = ResultCache[str]("test", max_size=10, ttl=60)
+        results = await asyncio.gather(
+            *(cache.get_or_compute("key", compute) for _ in range(5))
+        )
+        return cache, results
+
+    cache, results = asyncio.run(run())
+    assert results == ["value"] * 5
+    assert len(calls) == 1
+    assert cache.get("key") == "value"
+    assert cache.stats() == {"size": 1, "pending": 0}
+
+
+def test_cancelled_first_caller_does_not_cancel_the_others():
+    async def run():
+        cache = ResultCache[str]("test", max_size=10, ttl=60)
+        started = asyncio.Event()
+        release = asyncio.Event()
+
+        async def compute():
+            started.set()
+            await release.wait()
+            return "value"
+
+        first = asyncio.create_task(cache.get_or_compute("key", compute))
+        await started.wait()
+        second = asyncio.create_task(cache.get_or_compute("key", compute))
+        await asyncio.sleep(0)
+
+        first.cancel()
+        await asyncio.sleep(0)
+        release.set()
+
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return cache, await second
+
+    cache, second = asyncio.run(run())
+    assert second == "value"
+    # the computation completed and was cached despite the cancellation
+    assert cache.get("key") == "value"
+
+
+def test_errors_are_not_cached():
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        if len(calls) == 1:
+            raise ValueError("Albert is down")
+        return "value"
+
+    async def run():
+        cache = ResultCache[str]("test", max_size=10, ttl=60)
+        with pytest.raises(ValueError):
+            await cache.get_or_compute("key", compute)
+        assert cache.stats() == {"size": 0, "pending": 0}
+        return await cache.get_or_compute("key", compute)
+
+    assert asyncio.run(run()) == "value"
+    assert len(calls) == 2
+
+
+def test_entries_expire_and_are_evicted_least_recently_used(monkeypatch):
+    now = [0.0]
+    monkeypatch.setattr(result_cache.time, "monotonic", lambda: now[0])
+
+    cache = ResultCache[int]("test", max_size=2, ttl=10)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+    # "b" is the least recently used
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+
+    now[0] = 11
+    assert cache.get("a") is None
+    assert cache.stats() == {"size": 1, "pending": 0}
@@ -0,0 +1,84 @@
+import asyncio
+import threading
+import time
+from types import SimpleNamespace
+
+import tiktoken
+
+from srdt_analysis import tokenizer as tokenizer_module
+from srdt_analysis.api.main import get_tokenizer
+from srdt_analysis.tokenizer import Tokenizer
+
+
+def test_get_tokenizer_waits_off_the_event_loop(monkeypatch):
+    monkeypatch.setenv("TIKTOKEN_TOKENIZER_MODEL", "fake")
+    encoding = tiktoken.Encoding(
+        "fake",
+        pat_str=r"\S+|\s+",
+        mergeable_ranks={bytes([i]): i for i in range(256)},
+        special_tokens={},
+    )
+
+    def slow_get_encoding(name: str) -> tiktoken.Encoding:
+        time.sleep(0.3)
+        return encoding
+
+    monkeypatch.setattr(tiktoken, "get_encoding", slow_get_encoding)
+    tokenizer = Tokenizer()
+    request = SimpleNamespace(
+        app=SimpleNamespace(state=SimpleNamespace(tokenizer=tokenizer))
+    )
+
+    async def run():
+        ticks = 0
+
+        async def tick():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        ticker = asyncio.create_task(tick())
+        loaded = await get_tokenizer(request)  # type: ignore
+        ticker.cancel()
+        return loaded, ticks
+
+    loaded, ticks = asyncio.run(run())
+    assert loaded is tokenizer and tokenizer.loaded
+    # the loop kept running while the encoding was loaded
+    assert ticks >= 10
+    assert tokenizer.compute_nb_tokens("ab") == 2
+
+
+def test_long_texts_are_counted_off_the_event_loop(monkeypatch):
+    monkeypatch.setenv("TIKTOKEN_TOKENIZER_MODEL", "fake")
+    monkeypatch.setattr(tokenizer_module, "TOKENIZER_OFFLOAD_MIN_CHARS", 10)
+    tokenizer = Tokenizer()
+    tokenizer._encoding = tiktoken.Encoding(
+        "fake",
+        pat_str=r"\S+|\s+",
+        mergeable_ranks={bytes([i]): i for i in range(256)},
+        special_tokens={},
+    )
+    threads = []
+    encode = tokenizer._encode
+
+    def record(missing):
+        threads.append(threading.get_ident())
+        return encode(missing)
+
+    monkeypatch.setattr(tokenizer, "_encode", record)
+
+    async def run():
+        loop_thread = threading.get_ident()
+        short = await tokenizer.compute_nb_tokens_many_async(["ab", "c"])
+        long = await tokenizer.compute_nb_tokens_many_async(["ab", "d" * 20])
+        return loop_thread, short, long
+
+    loop_thread, short, long = asyncio.run(run())
+    assert short == [2, 1]
+    assert long == [2, 20]
+    assert threads[0] == loop_thread
+    assert threads[1] != loop_thread
+    # the counts were cached by the async calls
+    assert tokenizer.compute_nb_tokens_many(["d" * 20, "c"]) == [20, 1]
@@ -0,0 +1,62 @@
+import asyncio
+
+import pytest
+
+from srdt_analysis.url_cleaner import StreamingUrlCleaner, clean_urls
+
+
+class FakeArticleUrls:
+    def __init__(self, urls: dict[str, str]):
+        self.urls = urls
+
+    async def get(self, num: str):
+        return self.urls.get(num)
+
+
+class FakeCdtnUrls:
+    def __init__(self, urls: set[str]):
+        self.urls = urls
+
+    async def valid(self, urls: list[str]) -> dict[str, bool]:
+        return {url: url in self.urls for url in urls}
+
+
+ARTICLE_URLS = FakeArticleUrls({"L1234-5": "https://legifrance.gouv.fr/L1234-5"})
+CDTN_URLS = FakeCdtnUrls({"https://code.travail.gouv.fr/fiche/conges"})
+
+ANSWER = (
+    "Selon l'article L. 1234-5 du code du travail, le préavis est dû "
+    "([Source](https://example.com/preavis)). L'article L. 1234-5 du code de "
+    "la sécurité sociale ne s'applique pas. Voir [la fiche]"
+    "(https://code.travail.gouv.fr/fiche/conges) et [cette page]"
+    "(https://code.travail.gouv.fr/fiche/inconnue).\n"
+    "Le salarié peut aussi consulter [service-public](https://service-public.fr)."
+)
+
+
+def stream(text: str, size: int):
+    cleaner = StreamingUrlCleaner(ARTICLE_URLS, CDTN_URLS)  # type: ignore
+
+    async def run():
+        released = []
+        for i in range(0, len(text), size):
+            released.append(await cleaner.feed(text[i : i + size]))
+        released.append(await cleaner.flush())
+        return released
+
+    return asyncio.run(run())
+
+
+def test_text_released_before_newline():
+    released = stream("Le préavis est de deux mois pour les cadres", 5)
+    assert "".join(released[:-1]).startswith("Le préavis est de deux mois")
+    assert "".join(released) == "Le préavis est de deux mois pour les cadres"
+
+
+@pytest.mark.parametrize("size", [1, 3, 7, 50])
+def test_stream_matches_whole_answer(size):
+    expected = asyncio.run(clean_urls(ARTICLE_URLS, CDTN_URLS, ANSWER))  # type: ignore
+    assert "".join(stream(ANSWER, size)) == expected
+    assert "[L. 1234-5](https://legifrance.gouv.fr/L1234-5)" in expected
+    assert "example.com" not in expected
+    assert "inconnue" not in expected